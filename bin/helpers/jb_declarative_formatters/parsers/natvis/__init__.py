@@ -1 +1,2 @@
-from .natvis_parser import NatvisParsingError, natvis_parse_file
+from .natvis_parser import NatvisParsingError, natvis_parse_file, natvis_parse_file_with_digests, \
+    natvis_parse_file_types_with_digests, natvis_init_parsing_worker
@@ -1,6 +1,9 @@
+import hashlib
+import os
 import re
+import sys
 import traceback
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from xml.etree import ElementTree
 from xml.sax import saxutils
 
@@ -8,7 +11,7 @@ from jb_declarative_formatters import *
 from jb_declarative_formatters.type_viz_item_nodes import *
 
 from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template, TypeNameParsingError
-from jb_declarative_formatters.type_viz_expression import TypeVizCondition
+from jb_declarative_formatters.type_viz_expression import TypeVizCondition, intern_type_viz_object, intern_text
 from jb_declarative_formatters.type_viz_item_providers import TypeVizItemProviderCustomListItems
 from six import StringIO
 
@@ -22,25 +25,91 @@ class NatvisParsingError(Exception):
 _NS = {'natvis': NATVIS_SCHEMA_NAMESPACE}
 
 
-def natvis_parse_file(path, logger=None):
-    tree = ElementTree.parse(path)
-    root = tree.getroot()
-    for node_type_name in root.findall('natvis:Type', _NS):
-        try:
-            yield natvis_parse_type(node_type_name, logger)
-        except NatvisParsingError as e:
-            # expected parsing error happened
-            # - skip node and continue
-            if logger:
-                logger >> str(e)
-            continue
-        except Exception:
-            # unexpected parsing error happened
-            if logger:
-                logger >> traceback.format_exc()
-            else:
-                print(traceback.format_exc())
-            continue
+def natvis_parse_file(path, logger=None, progress_callback=None):
+    for _, type_viz in natvis_parse_file_with_digests(path, logger, progress_callback):
+        yield type_viz
+
+
+def natvis_parse_file_with_digests(path, logger=None, progress_callback=None,
+                                   parsed_types: Optional[Dict[bytes, TypeViz]] = None):
+    # Type nodes are parsed as soon as they are read and dropped afterwards,
+    # the whole document is never kept in memory.
+    # Types are yielded with digests of their nodes, nodes with digests from `parsed_types` are not parsed again.
+    type_tag = _make_tag('Type')
+    types_count = 0
+    with open(path, 'rb') as f:
+        total_size = os.fstat(f.fileno()).st_size
+        root = None
+        depth = 0
+        for event, node in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = node
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue
+
+            # direct child of the root is read completely
+            if node.tag == type_tag:
+                digest = _compute_node_digest(node)
+                type_viz = parsed_types.get(digest) if parsed_types else None
+                if type_viz is None:
+                    type_viz = _natvis_parse_type_skipping_errors(node, logger)
+                types_count += 1
+                if progress_callback:
+                    progress_callback(types_count, f.tell(), total_size)
+                if type_viz is not None:
+                    yield digest, type_viz
+            root.clear()
+
+
+def natvis_parse_file_types_with_digests(path) -> Tuple[List[Tuple[bytes, TypeViz]], List[str]]:
+    # results are picklable, files can be parsed in worker processes.
+    # Workers have no access to the debugger's logger, messages are returned to be logged by the caller.
+    logger = _MessagesCollector()
+    return list(natvis_parse_file_with_digests(path, logger)), logger.messages
+
+
+def natvis_init_parsing_worker(sys_path: List[str]):
+    # spawned workers start with a fresh interpreter, the helpers are found by the paths of the debugger's one
+    sys.path[:] = sys_path
+
+
+class _MessagesCollector(object):
+    def __init__(self):
+        self.messages = []
+
+    def __rshift__(self, message):
+        self.messages.append(message)
+
+
+def _compute_node_digest(node):
+    digest = hashlib.blake2b(digest_size=16)
+    for child in node.iter():
+        # whitespace after the node itself doesn't belong to the type
+        tail = child.tail if child is not node else None
+        digest.update(repr((child.tag, child.attrib, child.text, tail)).encode())
+    return digest.digest()
+
+
+def _natvis_parse_type_skipping_errors(node_type_name, logger):
+    try:
+        return natvis_parse_type(node_type_name, logger)
+    except NatvisParsingError as e:
+        # expected parsing error happened
+        # - skip node and continue
+        if logger:
+            logger >> str(e)
+    except Exception:
+        # unexpected parsing error happened
+        if logger:
+            logger >> traceback.format_exc()
+        else:
+            print(traceback.format_exc())
+    return None
 
 
 def _unescape(value):
@@ -128,11 +197,10 @@ def natvis_parse_type(node_type_name, logger=None):
     priority = _parse_type_priority(node_type_name, logger)
     type_viz = TypeViz(type_viz_names, inheritable, include_view, exclude_view, priority)
 
-    intrinsics = []
+    intrinsics = IntrinsicsExpander()
     for intrinsic in node_type_name.findall('natvis:Intrinsic', _NS):
-        name, expr = _natvis_node_parse_intrinsic(intrinsic, intrinsics)
-        intrinsics.append((name, expr))
-    intrinsics.sort(key=lambda x: len(x[0]), reverse=True)
+        name, parameters, expr = _natvis_node_parse_intrinsic(intrinsic, intrinsics)
+        intrinsics.add(name, parameters, expr)
 
     for display_string_node in node_type_name.findall('natvis:DisplayString', _NS):
         value = _natvis_node_parse_expression(display_string_node.text or '', intrinsics)
@@ -250,10 +318,100 @@ def _natvis_parse_format_specs(spec):
     return NATVIS_FORMAT_SPECIFIERS_MAPPING.get(spec, None), spec_flags
 
 
+_NATVIS_CALL_BRACKETS = {'(': ')', '[': ']', '{': '}'}
+
+
+def _split_call_arguments(expression, start):
+    # returns arguments of the call which parenthesis is open before `start` and the position after the call
+    args = []
+    closing = [')']
+    arg_start = start
+    quote = None
+    i = start
+    while i < len(expression):
+        c = expression[i]
+        if quote:
+            if c == '\\':
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c in _NATVIS_CALL_BRACKETS:
+            closing.append(_NATVIS_CALL_BRACKETS[c])
+        elif c == closing[-1]:
+            closing.pop()
+            if not closing:
+                args.append(expression[arg_start:i].strip())
+                if args == ['']:
+                    args = []
+                return args, i + 1
+        elif c == ',' and len(closing) == 1:
+            args.append(expression[arg_start:i].strip())
+            arg_start = i + 1
+        i += 1
+    return None, start
+
+
+# Expands calls of the intrinsics of a type in one pass over the expression. Calls are found with an alternation
+# of all intrinsic names, intrinsics may be overloaded by the number of parameters.
+class IntrinsicsExpander(object):
+    def __init__(self):
+        self.intrinsics = {}
+        self.regex = None
+        self.expansions = {}
+
+    def add(self, name, parameters, expression):
+        parameters_regex = None
+        if parameters:
+            alternatives = '|'.join(re.escape(param) for param in parameters)
+            parameters_regex = re.compile(r'(?<![\w.])(?<!->)(?:{})\b'.format(alternatives))
+        self.intrinsics[(name, len(parameters))] = (parameters, parameters_regex, expression)
+        self.regex = None
+        self.expansions.clear()
+
+    def expand(self, expression):
+        if not self.intrinsics:
+            return expression
+        expanded = self.expansions.get(expression)
+        if expanded is None:
+            expanded = self._expand(expression)
+            self.expansions[expression] = expanded
+        return expanded
+
+    def _expand(self, expression):
+        if self.regex is None:
+            names = sorted({name for name, _ in self.intrinsics}, key=len, reverse=True)
+            # member calls of the same name, like `x.size()`, are not intrinsic calls
+            self.regex = re.compile(r'(?<![\w.])(?<!->)({})\s*\('.format('|'.join(map(re.escape, names))))
+
+        result = []
+        pos = 0
+        for match in self.regex.finditer(expression):
+            if match.start() < pos:
+                continue
+            args, end = _split_call_arguments(expression, match.end())
+            intrinsic = self.intrinsics.get((match.group(1), len(args))) if args is not None else None
+            if intrinsic is None:
+                continue
+            result.append(expression[pos:match.start()])
+            result.append('(' + self._substitute(intrinsic, args) + ')')
+            pos = end
+        if pos == 0:
+            return expression
+        result.append(expression[pos:])
+        return ''.join(result)
+
+    def _substitute(self, intrinsic, args):
+        parameters, parameters_regex, expression = intrinsic
+        if not parameters:
+            return expression
+        values = {param: '(' + self.expand(arg) + ')' for param, arg in zip(parameters, args)}
+        return parameters_regex.sub(lambda m: values[m.group(0)], expression)
+
+
 def _apply_intrinsics_to_expression(expression, intrinsics):
-    for (intr_key, intr_value) in intrinsics:
-        expression = expression.replace(intr_key + '()', '(' + intr_value + ')')
-    return expression
+    return intrinsics.expand(expression)
 
 
 def _natvis_node_parse_expression(expression_text, intrinsics):
@@ -262,7 +420,7 @@ def _natvis_node_parse_expression(expression_text, intrinsics):
     expression_text = _unescape(expression_text)
     expression_text = expression_text.replace('\n', '')
 
-    return _apply_intrinsics_to_expression(expression_text, intrinsics)
+    return intern_text(_apply_intrinsics_to_expression(expression_text, intrinsics))
 
 
 def _natvis_node_parse_formatted_expression(expression_text, intrinsics) -> Optional[TypeVizExpression]:
@@ -286,7 +444,7 @@ def _natvis_node_parse_formatted_expression(expression_text, intrinsics) -> Opti
         expression = expression_text.strip()
 
     expression = _apply_intrinsics_to_expression(expression, intrinsics)
-    return TypeVizExpression(expression, array_size, format_spec, format_flags, view_spec)
+    return intern_type_viz_object(TypeVizExpression(expression, array_size, format_spec, format_flags, view_spec))
 
 
 def _natvis_node_parse_interpolated_string(text, intrinsics):
@@ -332,7 +490,7 @@ def _natvis_node_parse_interpolated_string(text, intrinsics):
     last_part = cur_part.getvalue()
     if last_part:
         parts_list.append((last_part, None))
-    return TypeVizInterpolatedString(parts_list)
+    return intern_type_viz_object(TypeVizInterpolatedString(parts_list))
 
 
 def _natvis_node_parse_name(item_node):
@@ -673,7 +831,7 @@ def _natvis_node_parse_condition(node, intrinsics):
     condition = _natvis_node_parse_expression(node.attrib.get('Condition'), intrinsics)
     include_view = _natvis_node_parse_include_view(node)
     exclude_view = _natvis_node_parse_exclude_view(node)
-    return TypeVizCondition(condition, include_view, exclude_view)
+    return intern_type_viz_object(TypeVizCondition(condition, include_view, exclude_view))
 
 
 def _natvis_node_parse_optional(node):
@@ -690,5 +848,6 @@ def _natvis_node_parse_include_view(node) -> str:
 
 def _natvis_node_parse_intrinsic(node, intrinsics):
     name = _unescape(node.attrib['Name'])
+    parameters = [_unescape(param.attrib['Name']) for param in node.findall('natvis:Parameter', _NS)]
     expr = _natvis_node_parse_expression(node.attrib['Expression'], intrinsics)
-    return name, expr
+    return name, parameters, expr
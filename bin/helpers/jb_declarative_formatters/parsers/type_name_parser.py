@@ -1,7 +1,8 @@
+import re
 from enum import Enum, auto
+from functools import lru_cache
 
 from jb_declarative_formatters.type_name_template import TypeNameTemplate
-from six import StringIO
 
 
 class TypeNameParsingError(Exception):
@@ -16,8 +17,47 @@ class DefaultDiagHandler(object):
         raise error
 
 
+TYPE_NAME_CACHE_MAX_SIZE = 16384
+
+_WHITESPACES_REGEX = re.compile(r'[ \n\t]+')
+_PUNCTUATION_SPACES_REGEX = re.compile(r' (?=[>,])|(?<=[<,]) ')
+_ELABORATED_TYPE_PREFIX_REGEX = re.compile(r'(^|[<,(])(?:struct|class) ')
+
+
+def normalize_type_name(type_name: str) -> str:
+    # Type names of the same type may come in different spelling from different sources (natvis files, debug info of
+    # different compilers), e.g. 'struct Foo<A, B<C> >' and 'Foo<A,B<C>>'. Bring them to the single form.
+    type_name = _WHITESPACES_REGEX.sub(' ', type_name).strip()
+    type_name = _PUNCTUATION_SPACES_REGEX.sub('', type_name)
+    return _ELABORATED_TYPE_PREFIX_REGEX.sub(r'\1', type_name)
+
+
 def parse_type_name_template(type_name, diag_handler=None) -> TypeNameTemplate:
-    diag_handler = diag_handler or DefaultDiagHandler()
+    if diag_handler is not None:
+        return _parse_type_name_template(normalize_type_name(type_name), diag_handler)
+    return _parse_normalized_type_name_template_cached(_normalize_type_name_cached(type_name))
+
+
+def get_type_name_cache_info():
+    return _parse_normalized_type_name_template_cached.cache_info()
+
+
+def clear_type_name_cache():
+    _normalize_type_name_cached.cache_clear()
+    _parse_normalized_type_name_template_cached.cache_clear()
+
+
+@lru_cache(maxsize=TYPE_NAME_CACHE_MAX_SIZE)
+def _normalize_type_name_cached(type_name):
+    return normalize_type_name(type_name)
+
+
+@lru_cache(maxsize=TYPE_NAME_CACHE_MAX_SIZE)
+def _parse_normalized_type_name_template_cached(normalized_type_name):
+    return _parse_type_name_template(normalized_type_name, DefaultDiagHandler())
+
+
+def _parse_type_name_template(type_name, diag_handler) -> TypeNameTemplate:
     lexer = Lexer(type_name, diag_handler)
     parser = Parser(lexer, diag_handler)
     return parser.parse_type_name()
@@ -51,7 +91,6 @@ class Token(object):
 
 
 class Lexer(object):
-    WHITESPACES = [' ', '\n', '\t']
     TT_MAP = {
         '<': TokenType.LESS,
         '>': TokenType.GREATER,
@@ -69,33 +108,24 @@ class Lexer(object):
         self.diag_handler = diag_handler
         self.pos = 0
 
+    TOKEN_REGEX = re.compile(r'([ \n\t]*)(?:([<>,*()])|([^ \n\t<>,*()]+))?')
+
     def fetch(self):
-        # skip whitespaces
-        spaces_start_pos = self.pos
-        while self.pos < self.stream_len and self.stream[self.pos] in self.WHITESPACES:
-            self.pos += 1
-        spaces = self.pos - spaces_start_pos
-        if self.pos >= self.stream_len:
-            return Token(TokenType.END, '', self.pos, spaces)
-
-        tok_start_pos = self.pos
-        c = self.stream[self.pos]
-        self.pos += 1
-        if c in self.TT_MAP:
-            tt = self.TT_MAP[c]
-            return Token(tt, c, tok_start_pos, spaces)
+        match = self.TOKEN_REGEX.match(self.stream, self.pos)
+        spaces = len(match.group(1))
+        tok_start_pos = self.pos + spaces
+        self.pos = match.end()
+
+        punctuation = match.group(2)
+        if punctuation is not None:
+            return Token(self.TT_MAP[punctuation], punctuation, tok_start_pos, spaces)
 
         # interprete anything else as identifier
-        while self.pos < self.stream_len:
-            c = self.stream[self.pos]
-            if c in self.WHITESPACES:
-                break
-            if c in self.TT_MAP:
-                break
-            self.pos += 1
+        ident = match.group(3)
+        if ident is not None:
+            return Token(TokenType.IDENT, ident, tok_start_pos, spaces)
 
-        ident = self.stream[tok_start_pos:self.pos]
-        return Token(TokenType.IDENT, ident, tok_start_pos, spaces)
+        return Token(TokenType.END, '', self.pos, spaces)
 
     def _raise_error(self, message):
         self.diag_handler.raise_error(self._make_error(message))
@@ -104,6 +134,10 @@ class Lexer(object):
         return TypeNameParsingError(self.stream, self.pos, message)
 
 
+_TYPE_LIST = 1
+_SIGNATURE = 2
+
+
 class Parser(object):
     def __init__(self, lexer, diag_handler):
         self.lexer = lexer
@@ -127,44 +161,42 @@ class Parser(object):
         return ident
 
     def _parse_type_name_template(self) -> TypeNameTemplate:
-        ident = StringIO()
-        fmt = StringIO()
+        # Template argument lists and signatures are parsed with an explicit stack of enclosing type names instead of
+        # recursion: generated type names can be nested deeper than the interpreter recursion limit.
+        # Every stack entry is (kind, ident parts, fmt parts, args, is first signature item) of the enclosing type name.
+        stack = []
+        ident = []
+        fmt = []
         args = []
 
         while True:
             if self.tt() == TokenType.IDENT:
                 name = self._parse_name()
-                ident.write(name)
-                fmt.write(name)
+                ident.append(name)
+                fmt.append(name)
 
                 if self.tt() == TokenType.LESS:
-                    ident.write(self.token.text)
-                    fmt.write(self.token.text)
+                    ident.append(self.token.text)
+                    fmt.append(self.token.text)
                     self.advance()
 
-                    if self.tt() != TokenType.GREATER:
-                        args_part, args_fmt = self._parse_type_list()
-                        # write format string to substitute template arguments
-                        fmt.write(args_fmt)
-                        args.extend(args_part)
-
-                    if self.tt() != TokenType.GREATER:
-                        self._raise_unexpected_token_error('\'>\'')
-
-                    ident.write(self.token.text)
-                    fmt.write(self.token.text)
+                    if self.tt() == TokenType.GREATER:
+                        self._parse_template_args_end(ident, fmt)
+                        continue
 
-                    self.advance()
-
-                    ident.write(' ' * self.token.spaces_before)
-                    fmt.write(' ' * self.token.spaces_before)
+                    # parse type|*[,...]
+                    if self.tt() != TokenType.MUL:
+                        fmt.append(' ' * self.token.spaces_before)
+                    if self._parse_type_list_wildcards(ident, fmt, args):
+                        stack.append((_TYPE_LIST, ident, fmt, args, False))
+                        ident, fmt, args = [], [], []
 
                 continue
 
             if self.tt() == TokenType.LESS:
                 # try to parse as  lambda anonymous class name <lambda_...>
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
+                ident.append(self.token.text)
+                fmt.append(self.token.text)
 
                 self.advance()
 
@@ -174,125 +206,135 @@ class Parser(object):
                 if not self.token.text.startswith('lambda_'):
                     self._raise_unexpected_token_error('<lambda>')
 
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
+                ident.append(self.token.text)
+                fmt.append(self.token.text)
 
                 self.advance()
 
-                if self.tt() != TokenType.GREATER:
-                    self._raise_unexpected_token_error('\'>\'')
-
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
-
-                self.advance()
-
-                ident.write(' ' * self.token.spaces_before)
-                fmt.write(' ' * self.token.spaces_before)
-
+                self._parse_template_args_end(ident, fmt)
                 continue
 
             if self.tt() == TokenType.MUL:
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
+                ident.append(self.token.text)
+                fmt.append(self.token.text)
 
                 self.advance()
 
-                ident.write(' ' * self.token.spaces_before)
-                fmt.write(' ' * self.token.spaces_before)
+                ident.append(' ' * self.token.spaces_before)
+                fmt.append(' ' * self.token.spaces_before)
 
                 continue
 
             if self.tt() == TokenType.LPARENT:
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
+                ident.append(self.token.text)
+                fmt.append(self.token.text)
 
                 self.advance()
 
-                ident.write(' ' * self.token.spaces_before)
-                fmt.write(' ' * self.token.spaces_before)
+                ident.append(' ' * self.token.spaces_before)
+                fmt.append(' ' * self.token.spaces_before)
 
                 if self.tt() != TokenType.RPARENT:
-                    self._parse_signature(ident, fmt, args)
-
-                if self.tt() != TokenType.RPARENT:
-                    self._raise_unexpected_token_error('\')\'')
-
-                ident.write(self.token.text)
-                fmt.write(self.token.text)
-
-                self.advance()
-
-                ident.write(' ' * self.token.spaces_before)
-                fmt.write(' ' * self.token.spaces_before)
+                    # parse type[,...]
+                    stack.append((_SIGNATURE, ident, fmt, args, True))
+                    ident, fmt, args = [], [], []
+                    continue
 
+                self._parse_signature_end(ident, fmt)
                 continue
 
-            break
+            # current type name is complete, return it to the enclosing one
+            cur_type = TypeNameTemplate(''.join(ident), ''.join(fmt), args)
+            while stack:
+                kind, ident, fmt, args, is_first = stack.pop()
+                if kind == _TYPE_LIST:
+                    args.append(cur_type)
+                    fmt.append('{}')
+                    if self.tt() != TokenType.COMMA:
+                        self._parse_template_args_end(ident, fmt)
+                        break
+
+                    fmt.append(self.token.text)
+                    self.advance()
+                    if self._parse_type_list_wildcards(ident, fmt, args):
+                        stack.append((_TYPE_LIST, ident, fmt, args, False))
+                        ident, fmt, args = [], [], []
+                    break
+
+                ident.append(cur_type.name)
+                fmt.append(cur_type.fmt)
+                args.extend(cur_type.args)
+                if not is_first:
+                    fmt.append(' ' * self.token.spaces_before)
+                    ident.append(' ' * self.token.spaces_before)
+
+                if self.tt() != TokenType.COMMA:
+                    self._parse_signature_end(ident, fmt)
+                    break
+
+                fmt.append(self.token.text)
+                ident.append(self.token.text)
+                self.advance()
 
-        return TypeNameTemplate(ident.getvalue(), fmt.getvalue(), args)
+                fmt.append(' ' * self.token.spaces_before)
+                ident.append(' ' * self.token.spaces_before)
+                stack.append((_SIGNATURE, ident, fmt, args, False))
+                ident, fmt, args = [], [], []
+                break
+            else:
+                return cur_type
 
     def _parse_name(self):
-        ident = self.token.text
+        ident = [self.token.text]
         self.advance()
         while self.tt() == TokenType.MUL or self.tt() == TokenType.IDENT:
-            ident += ' ' * self.token.spaces_before + self.token.text
+            ident.append(' ' * self.token.spaces_before)
+            ident.append(self.token.text)
             self.advance()
-        ident += ' ' * self.token.spaces_before
-        return ident
+        ident.append(' ' * self.token.spaces_before)
+        return ''.join(ident)
 
-    def _parse_type_list(self):
-        args = []
-        fmt = StringIO()
-
-        # parse type|*[,...]
-        spaces_before_type_name = self.token.spaces_before
-        cur_type = self._parse_type_name_or_wildcard()
-        if not cur_type.is_wildcard:
-            fmt.write(' ' * spaces_before_type_name)
-        args.append(cur_type)
-        fmt.write('{}')
-
-        while self.tt() == TokenType.COMMA:
-            fmt.write(self.token.text)
+    def _parse_type_list_wildcards(self, ident, fmt, args):
+        # consume wildcard arguments of the template arguments list,
+        # returns True if the next argument is a type name that has to be parsed
+        while self.tt() == TokenType.MUL:
+            # ignore spaces before wildcard
+            args.append(TypeNameTemplate(self.token.text))
+            fmt.append('{}')
             self.advance()
 
-            cur_type = self._parse_type_name_or_wildcard()
-            args.append(cur_type)
-            fmt.write('{}')
+            if self.tt() != TokenType.COMMA:
+                self._parse_template_args_end(ident, fmt)
+                return False
 
-        return args, fmt.getvalue()
+            fmt.append(self.token.text)
+            self.advance()
 
-    def _parse_signature(self, ident: StringIO, fmt: StringIO, args):
-        # parse type[,...]
-        cur_type = self._parse_type_name_template()
-        ident.write(cur_type.name)
-        fmt.write(cur_type.fmt)
-        args.extend(cur_type.args)
+        return True
 
-        while self.tt() == TokenType.COMMA:
-            fmt.write(self.token.text)
-            ident.write(self.token.text)
-            self.advance()
+    def _parse_template_args_end(self, ident, fmt):
+        if self.tt() != TokenType.GREATER:
+            self._raise_unexpected_token_error('\'>\'')
+
+        ident.append(self.token.text)
+        fmt.append(self.token.text)
 
-            fmt.write(' ' * self.token.spaces_before)
-            ident.write(' ' * self.token.spaces_before)
-            cur_type = self._parse_type_name_template()
-            ident.write(cur_type.name)
-            fmt.write(cur_type.fmt)
-            args.extend(cur_type.args)
+        self.advance()
 
-            fmt.write(' ' * self.token.spaces_before)
-            ident.write(' ' * self.token.spaces_before)
+        ident.append(' ' * self.token.spaces_before)
+        fmt.append(' ' * self.token.spaces_before)
 
-    def _parse_type_name_or_wildcard(self):
-        if self.tt() == TokenType.MUL:
-            # ignore spaces before wildcard
-            ident = self.token.text
-            self.advance()
-            return TypeNameTemplate(ident)
+    def _parse_signature_end(self, ident, fmt):
+        if self.tt() != TokenType.RPARENT:
+            self._raise_unexpected_token_error('\')\'')
+
+        ident.append(self.token.text)
+        fmt.append(self.token.text)
+
+        self.advance()
 
-        return self._parse_type_name_template()
+        ident.append(' ' * self.token.spaces_before)
+        fmt.append(' ' * self.token.spaces_before)
 
     def _raise_unexpected_token_error(self, expected_message):
         self._raise_error('Unexpected token \'{}\', expected {}'.format(self.token, expected_message))
@@ -0,0 +1,58 @@
+import sys
+import time
+
+from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template, DefaultDiagHandler
+
+# Parsing times of pathological type names. Run from bin/helpers:
+#   python3 -m jb_declarative_formatters.parsers.type_name_parser_benchmark [<repeat count>]
+
+DEFAULT_REPEAT_COUNT = 5
+
+
+def make_deep_name(depth):
+    return 'A<' * depth + 'int' + '>' * depth
+
+
+def make_spirit_like_name(width):
+    rule = 'boost::spirit::x3::rule<tag{},std::basic_string<char,std::char_traits<char>,std::allocator<char>>,false>'
+    return 'boost::spirit::x3::sequence<' + ','.join(rule.format(i) for i in range(width)) + '>'
+
+
+def make_eigen_like_name(depth):
+    matrix = 'Eigen::Matrix<double,-1,-1,0,-1,-1>'
+    sum_op = 'Eigen::CwiseBinaryOp<Eigen::internal::scalar_sum_op<double,double>,const {},const ' + matrix + '>'
+    name = matrix
+    for _ in range(depth):
+        name = sum_op.format(name)
+    return name
+
+
+CASES = [
+    ('A<A<...<int>...>> 200 levels', make_deep_name(200)),
+    ('A<A<...<int>...>> 900 levels', make_deep_name(900)),
+    ('Spirit-like sequence of 300 rules', make_spirit_like_name(300)),
+    ('Eigen-like expression of 150 levels', make_eigen_like_name(150)),
+]
+
+
+def measure(type_name, repeat_count):
+    # the cache is bypassed by passing a diagnostics handler, every parse starts from scratch
+    start = time.perf_counter()
+    for _ in range(repeat_count):
+        str(parse_type_name_template(type_name, DefaultDiagHandler()))
+    return (time.perf_counter() - start) / repeat_count
+
+
+def main():
+    repeat_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT_COUNT
+    print('Average of {} parses + str(), recursion limit {}'.format(repeat_count, sys.getrecursionlimit()))
+    for title, type_name in CASES:
+        try:
+            result = '{:.1f} ms'.format(measure(type_name, repeat_count) * 1000)
+        except RecursionError:
+            result = 'RecursionError'
+        print('  {:<40} {:>6} KB {:>12}'.format(title, len(type_name) // 1024, result))
+
+
+if __name__ == '__main__':
+    main()
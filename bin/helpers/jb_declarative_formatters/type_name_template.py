@@ -1,19 +1,43 @@
 class TypeNameTemplate(object):
+    # Instances are shared through the type name parsing cache, so they must never be modified after construction
+    __slots__ = ('name', 'fmt', 'args', '_text')
+
     def __init__(self, name, fmt=None, args=None):
         super(TypeNameTemplate, self).__init__()
 
-        if args is None:
-            args = []
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'fmt', fmt)
+        object.__setattr__(self, 'args', tuple(args) if args else ())
+        object.__setattr__(self, '_text', None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('TypeNameTemplate is immutable')
 
-        self.name = name
-        self.fmt = fmt
-        self.args = args
+    def __delattr__(self, key):
+        raise AttributeError('TypeNameTemplate is immutable')
+
+    def __reduce__(self):
+        return TypeNameTemplate, (self.name, self.fmt, self.args)
 
     def __str__(self):
-        if self.args:
-            return self.fmt.format(*map(str, self.args))
+        if self._text is None:
+            # format nested arguments first without recursion, deeply nested type names are not rare
+            pending = [self]
+            while pending:
+                template = pending[-1]
+                unformatted_args = [arg for arg in template.args if arg._text is None]
+                if unformatted_args:
+                    pending.extend(unformatted_args)
+                    continue
+
+                pending.pop()
+                if template.args:
+                    text = template.fmt.format(*[arg._text for arg in template.args])
+                else:
+                    text = template.name
+                object.__setattr__(template, '_text', text)
 
-        return self.name
+        return self._text
 
     @property
     def has_wildcard(self):
@@ -3,6 +3,8 @@ from jb_declarative_formatters.type_viz_expression import get_custom_view_spec_i
 
 
 class TypeVizName(object):
+    __slots__ = ('type_name', 'type_name_template')
+
     def __init__(self, type_name, type_name_template: TypeNameTemplate):
         self.type_name = type_name
         self.type_name_template = type_name_template
@@ -16,6 +18,9 @@ class TypeVizName(object):
 
 
 class TypeViz(object):
+    __slots__ = ('logger', 'type_viz_names', 'is_inheritable', 'include_view', 'include_view_id', 'exclude_view',
+                 'exclude_view_id', 'priority', 'summaries', 'item_providers')
+
     def __init__(self, type_viz_names, is_inheritable, include_view: str, exclude_view: str, priority, logger=None):
         self.logger = logger  # TODO: or stub
 
@@ -28,3 +33,13 @@ class TypeViz(object):
         self.priority = priority
         self.summaries = []
         self.item_providers = None
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        # types may be parsed by a worker process which numbered the views differently
+        self.include_view_id = get_custom_view_spec_id_by_name(self.include_view)
+        self.exclude_view_id = get_custom_view_spec_id_by_name(self.exclude_view)
@@ -1,3 +1,5 @@
+import sys
+import weakref
 from enum import IntEnum, IntFlag, auto
 from six import StringIO
 
@@ -44,15 +46,37 @@ def get_custom_view_spec_id_by_name(view_spec: str) -> int:
     return 0
 
 
+# Equal expressions, format options and conditions repeat across thousands of types,
+# the parser keeps one shared instance of each. Interned objects must never be modified.
+# The table doesn't keep them alive, objects of removed and reloaded files are freed.
+g_interned_objects = weakref.WeakValueDictionary()
+
+
+def intern_type_viz_object(obj):
+    # the reduced form holds the values of the object but not the object itself, so it can be a key of a weak table
+    return g_interned_objects.setdefault(obj.__reduce__()[1], obj)
+
+
+def intern_text(text):
+    return sys.intern(text) if text else text
+
+
 class TypeVizFormatOptions(object):
+    __slots__ = ('array_size', 'format_spec', 'format_flags', 'view_spec', 'view_spec_id', '__weakref__')
+
     def __init__(self, array_size: str = None, format_spec: TypeVizFormatSpec = None,
                  format_flags: TypeVizFormatFlags = None, view_spec=None):
-        self.array_size = array_size
+        self.array_size = intern_text(array_size)
         self.format_spec: TypeVizFormatSpec = format_spec
         self.format_flags: TypeVizFormatFlags = format_flags
-        self.view_spec = view_spec
+        self.view_spec = intern_text(view_spec)
         self.view_spec_id = get_custom_view_spec_id_by_name(view_spec)
 
+    def __reduce__(self):
+        # view ids are assigned by the process, objects may be parsed in another one
+        return _make_interned, (TypeVizFormatOptions, self.array_size, self.format_spec, self.format_flags,
+                                self.view_spec)
+
     def __str__(self):
         r = ''
         if self.array_size:
@@ -90,28 +114,59 @@ class TypeVizFormatOptions(object):
             return False
         return True
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.array_size, self.format_spec, self.format_flags, self.view_spec))
+
 
 class TypeVizCondition(object):
+    __slots__ = ('condition', 'include_view', 'include_view_id', 'exclude_view', 'exclude_view_id', '__weakref__')
+
     def __init__(self, condition: str, include_view: str, exclude_view: str):
-        self.condition = condition
-        self.include_view = include_view
+        self.condition = intern_text(condition)
+        self.include_view = intern_text(include_view)
         self.include_view_id = get_custom_view_spec_id_by_name(include_view)
-        self.exclude_view = exclude_view
+        self.exclude_view = intern_text(exclude_view)
         self.exclude_view_id = get_custom_view_spec_id_by_name(exclude_view)
 
+    def __reduce__(self):
+        return _make_interned, (TypeVizCondition, self.condition, self.include_view, self.exclude_view)
+
+    def __eq__(self, other):
+        if not isinstance(other, TypeVizCondition):
+            return False
+        return (self.condition, self.include_view, self.exclude_view) == \
+               (other.condition, other.include_view, other.exclude_view)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.condition, self.include_view, self.exclude_view))
+
 
 class TypeVizExpression(object):
+    __slots__ = ('text', 'view_options', '__weakref__')
+
     def __init__(self, text: str, array_size: str = None, format_spec: TypeVizFormatSpec = None,
                  format_flags: TypeVizFormatFlags = None, view_spec=None):
-        self.text = text
-        self.view_options = TypeVizFormatOptions(array_size, format_spec, format_flags, view_spec)
+        self.text = intern_text(text)
+        self.view_options = intern_type_viz_object(
+            TypeVizFormatOptions(array_size, format_spec, format_flags, view_spec))
+
+    def __reduce__(self):
+        options = self.view_options
+        return _make_interned, (TypeVizExpression, self.text, options.array_size, options.format_spec,
+                                options.format_flags, options.view_spec)
 
     def __str__(self):
         r = "'{}'{}".format(self.text, self.view_options)
         return r
 
     def __repr__(self):
-        return repr(self.__dict__)
+        return repr({'text': self.text, 'view_options': self.view_options})
 
     def __eq__(self, other):
         if not isinstance(other, TypeVizExpression):
@@ -130,8 +185,10 @@ class TypeVizExpression(object):
 
 
 class TypeVizInterpolatedString(object):
+    __slots__ = ('parts_list', '__weakref__')
+
     def __init__(self, parts_list):
-        self.parts_list = parts_list
+        self.parts_list = tuple((intern_text(s), e) for (s, e) in parts_list)
 
     def __str__(self):
         result = StringIO()
@@ -141,8 +198,11 @@ class TypeVizInterpolatedString(object):
                 result.write(str(e))
         return result.getvalue()
 
+    def __reduce__(self):
+        return _make_interned, (TypeVizInterpolatedString, self.parts_list)
+
     def __repr__(self):
-        return repr(self.__dict__)
+        return repr({'parts_list': self.parts_list})
 
     def __eq__(self, other):
         if not isinstance(other, TypeVizInterpolatedString):
@@ -154,3 +214,7 @@ class TypeVizInterpolatedString(object):
 
     def __hash__(self):
         return hash(self.parts_list)
+
+
+def _make_interned(cls, *args):
+    return intern_type_viz_object(cls(*args))
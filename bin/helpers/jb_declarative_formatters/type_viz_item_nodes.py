@@ -12,44 +12,60 @@ from .type_viz_mixins import \
 class TypeVizItemSizeTypeNode(TypeVizItemConditionalNodeMixin,
                               TypeVizItemOptionalNodeMixin,
                               TypeVizItemValueNodeMixin):
+    __slots__ = ('condition', 'optional', 'text')
+
     def __init__(self, text, condition=None, optional=False):
         super(TypeVizItemSizeTypeNode, self).__init__(text=text, condition=condition, optional=optional)
 
 
 class TypeVizItemValuePointerTypeNode(TypeVizItemConditionalNodeMixin,
                                       TypeVizItemFormattedExpressionNodeMixin):
+    __slots__ = ('condition', 'expr')
+
     def __init__(self, expr, condition=None):
         super(TypeVizItemValuePointerTypeNode, self).__init__(expr=expr, condition=condition)
 
 
 class TypeVizItemIndexNodeTypeNode(TypeVizItemConditionalNodeMixin,
                                    TypeVizItemFormattedExpressionNodeMixin):
+    __slots__ = ('condition', 'expr')
+
     def __init__(self, expr, condition=None):
         super(TypeVizItemIndexNodeTypeNode, self).__init__(expr=expr, condition=condition)
 
 
 class TypeVizItemListItemsHeadPointerTypeNode(TypeVizItemValueNodeMixin):
+    __slots__ = ('text',)
+
     def __init__(self, text):
         super(TypeVizItemListItemsHeadPointerTypeNode, self).__init__(text=text)
 
 
 class TypeVizItemListItemsNextPointerTypeNode(TypeVizItemValueNodeMixin):
+    __slots__ = ('text',)
+
     def __init__(self, text):
         super(TypeVizItemListItemsNextPointerTypeNode, self).__init__(text=text)
 
 
 class TypeVizItemListItemsIndexNodeTypeNode(TypeVizItemNamedNodeMixin,
                                             TypeVizItemFormattedExpressionNodeMixin):
+    __slots__ = ('name', 'expr')
+
     def __init__(self, expr, name=None):
         super(TypeVizItemListItemsIndexNodeTypeNode, self).__init__(expr=expr, name=name)
 
 
 class TypeVizItemTreeHeadPointerTypeNode(TypeVizItemValueNodeMixin):
+    __slots__ = ('text',)
+
     def __init__(self, text):
         super(TypeVizItemTreeHeadPointerTypeNode, self).__init__(text=text)
 
 
 class TypeVizItemTreeChildPointerTypeNode(TypeVizItemValueNodeMixin):
+    __slots__ = ('text',)
+
     def __init__(self, text):
         super(TypeVizItemTreeChildPointerTypeNode, self).__init__(text=text)
 
@@ -57,45 +73,61 @@ class TypeVizItemTreeChildPointerTypeNode(TypeVizItemValueNodeMixin):
 class TypeVizItemTreeNodeTypeNode(TypeVizItemNamedNodeMixin,
                                   TypeVizItemConditionalNodeMixin,
                                   TypeVizItemFormattedExpressionNodeMixin):
+    __slots__ = ('name', 'condition', 'expr')
+
     def __init__(self, expr, name=None, condition=None):
         super(TypeVizItemTreeNodeTypeNode, self).__init__(expr=expr, name=name, condition=condition)
 
 
 class TypeVizItemVariableTypeNode(object):
+    __slots__ = ('name', 'initial_value')
+
     def __init__(self, name: str, initial_value: str):
         self.name: str = name
         self.initial_value: str = initial_value
 
 
 class TypeVizItemLoopCodeBlockTypeNode(object):
+    __slots__ = ('condition', 'code_blocks')
+
     def __init__(self, condition: str, code_blocks: List):
         self.condition: str = condition
         self.code_blocks: List = code_blocks
 
 
 class TypeVizItemBreakCodeBlockTypeNode(object):
+    __slots__ = ('condition',)
+
     def __init__(self, condition: str):
         self.condition: str = condition
 
 
 class TypeVizItemIfCodeBlockTypeNode(object):
+    __slots__ = ('condition', 'code_blocks')
+
     def __init__(self, condition, code_blocks: List):
         self.condition: str = condition
         self.code_blocks: List = code_blocks
 
 
 class TypeVizItemElseIfCodeBlockTypeNode(object):
+    __slots__ = ('condition', 'code_blocks')
+
     def __init__(self, condition: str, code_blocks: List):
         self.condition: str = condition
         self.code_blocks: List = code_blocks
 
 
 class TypeVizItemElseCodeBlockTypeNode(object):
+    __slots__ = ('code_blocks',)
+
     def __init__(self, code_blocks: List):
         self.code_blocks: List = code_blocks
 
 
 class TypeVizItemItemCodeBlockTypeNode(TypeVizItemFormattedExpressionNodeMixin):
+    __slots__ = ('expr', 'name', 'condition')
+
     def __init__(self, condition: str, name: TypeVizInterpolatedString, value: TypeVizExpression):
         super(TypeVizItemItemCodeBlockTypeNode, self).__init__(expr=value)
         self.name: TypeVizInterpolatedString = name
@@ -103,6 +135,8 @@ class TypeVizItemItemCodeBlockTypeNode(TypeVizItemFormattedExpressionNodeMixin):
 
 
 class TypeVizItemExecCodeBlockTypeNode(object):
+    __slots__ = ('condition', 'value')
+
     def __init__(self, condition: str, value: str):
         self.condition: str = condition
         self.value: str = value
@@ -28,6 +28,7 @@ class TypeVizItemProviderSingle(TypeVizItemFormattedExpressionNodeMixin,
                                 TypeVizItemConditionalNodeMixin,
                                 TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.Single
+    __slots__ = ('expr', 'name', 'condition', 'optional')
 
     def __init__(self, name, expr, condition=None, optional=False):
         super(TypeVizItemProviderSingle, self).__init__(expr=expr, name=name, condition=condition, optional=optional)
@@ -37,6 +38,7 @@ class TypeVizItemProviderExpanded(TypeVizItemFormattedExpressionNodeMixin,
                                   TypeVizItemConditionalNodeMixin,
                                   TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.Expanded
+    __slots__ = ('expr', 'condition', 'optional')
 
     def __init__(self, expr, condition=None, optional=False):
         super(TypeVizItemProviderExpanded, self).__init__(expr=expr, condition=condition, optional=optional)
@@ -45,6 +47,7 @@ class TypeVizItemProviderExpanded(TypeVizItemFormattedExpressionNodeMixin,
 class TypeVizItemProviderArrayItems(TypeVizItemConditionalNodeMixin,
                                     TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.ArrayItems
+    __slots__ = ('condition', 'optional', 'size_nodes', 'value_pointer_nodes')
 
     def __init__(self, size_nodes, value_pointer_nodes, condition=None, optional=False):
         super(TypeVizItemProviderArrayItems, self).__init__(condition=condition, optional=optional)
@@ -55,6 +58,7 @@ class TypeVizItemProviderArrayItems(TypeVizItemConditionalNodeMixin,
 class TypeVizItemProviderIndexListItems(TypeVizItemConditionalNodeMixin,
                                         TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.IndexListItems
+    __slots__ = ('condition', 'optional', 'size_nodes', 'value_node_nodes')
 
     def __init__(self, size_nodes, value_node_nodes, condition=None, optional=False):
         super(TypeVizItemProviderIndexListItems, self).__init__(condition=condition, optional=optional)
@@ -65,6 +69,7 @@ class TypeVizItemProviderIndexListItems(TypeVizItemConditionalNodeMixin,
 class TypeVizItemProviderLinkedListItems(TypeVizItemConditionalNodeMixin,
                                          TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.LinkedListItems
+    __slots__ = ('condition', 'optional', 'size_nodes', 'head_pointer_node', 'next_pointer_node', 'value_node_node')
 
     def __init__(self, size_nodes, head_pointer_node, next_pointer_node, value_node_node, condition=None,
                  optional=False):
@@ -78,6 +83,8 @@ class TypeVizItemProviderLinkedListItems(TypeVizItemConditionalNodeMixin,
 class TypeVizItemProviderTreeItems(TypeVizItemConditionalNodeMixin,
                                    TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.TreeItems
+    __slots__ = ('condition', 'optional', 'size_nodes', 'head_pointer_node', 'left_pointer_node', 'right_pointer_node',
+                 'value_node_node')
 
     def __init__(self, size_nodes, head_pointer_node, left_pointer_node, right_pointer_node, value_node_node,
                  condition=None,
@@ -93,6 +100,7 @@ class TypeVizItemProviderTreeItems(TypeVizItemConditionalNodeMixin,
 class TypeVizItemProviderCustomListItems(TypeVizItemConditionalNodeMixin,
                                          TypeVizItemOptionalNodeMixin):
     kind = TypeVizItemProviderTypeKind.CustomListItems
+    __slots__ = ('condition', 'optional', 'variables_nodes', 'size_nodes', 'code_block_nodes')
 
     def __init__(self, variables_nodes, size_nodes, code_block_nodes, condition=None, optional=False):
         super(TypeVizItemProviderCustomListItems, self).__init__(condition=condition, optional=optional)
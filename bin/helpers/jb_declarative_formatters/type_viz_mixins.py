@@ -2,24 +2,32 @@ from .type_viz_expression import TypeVizExpression, TypeVizCondition
 
 
 class TypeVizItemConditionalNodeMixin(object):
+    __slots__ = ()
+
     def __init__(self, condition: TypeVizCondition, *args, **kwargs):
         super(TypeVizItemConditionalNodeMixin, self).__init__(*args, **kwargs)
         self.condition: TypeVizCondition = condition
 
 
 class TypeVizItemOptionalNodeMixin(object):
+    __slots__ = ()
+
     def __init__(self, optional, *args, **kwargs):
         super(TypeVizItemOptionalNodeMixin, self).__init__(*args, **kwargs)
         self.optional = optional
 
 
 class TypeVizItemNamedNodeMixin(object):
+    __slots__ = ()
+
     def __init__(self, name, *args, **kwargs):
         super(TypeVizItemNamedNodeMixin, self).__init__(*args, **kwargs)
         self.name = name
 
 
 class TypeVizItemFormattedExpressionNodeMixin(object):
+    __slots__ = ()
+
     def __init__(self, expr, *args, **kwargs):
         super(TypeVizItemFormattedExpressionNodeMixin, self).__init__(*args, **kwargs)
         assert (isinstance(expr, TypeVizExpression))
@@ -27,6 +35,8 @@ class TypeVizItemFormattedExpressionNodeMixin(object):
 
 
 class TypeVizItemValueNodeMixin(object):
+    __slots__ = ()
+
     def __init__(self, text, *args, **kwargs):
         super(TypeVizItemValueNodeMixin, self).__init__(*args, **kwargs)
         self.text = text
@@ -1,7 +1,8 @@
+import bisect
 import re
 from collections import defaultdict
 
-from typing import List
+from typing import Iterable, List
 
 import six
 from jb_declarative_formatters import TypeViz, TypeVizName
@@ -31,6 +32,8 @@ class DirectAcyclicGraph(object):
 
 
 class TypeVizDescriptor(object):
+    __slots__ = ('name', 'regex', 'visualizers', 'more_specific_descriptors')
+
     def __init__(self, type_viz_name: TypeVizName, regex: str, visualizer: TypeViz):
         self.name = type_viz_name
         self.regex = regex
@@ -43,10 +46,15 @@ class TypeVizDescriptor(object):
 
 class TypeVizStorage(object):
     class Item(object):
+        __slots__ = ('descriptors_was_sorted', 'exact_match', 'wildcard_match', 'wildcard_match_regex',
+                     'wildcard_match_groups')
+
         def __init__(self):
             self.descriptors_was_sorted: bool = False
             self.exact_match: List[TypeVizDescriptor] = []
             self.wildcard_match: List[TypeVizDescriptor] = []
+            self.wildcard_match_regex = None
+            self.wildcard_match_groups = None
 
         def ensure_descriptors_sorted(self):
             if self.descriptors_was_sorted:
@@ -60,54 +68,86 @@ class TypeVizStorage(object):
 
             graph = DirectAcyclicGraph(self.wildcard_match, lambda m: m.more_specific_descriptors)
             self.wildcard_match = list(graph.sort())
+            self.wildcard_match_regex = None
+            self.wildcard_match_groups = None
             self.descriptors_was_sorted = True
 
+        def get_wildcard_match_regex(self):
+            # every descriptor is tried by its own lookahead, so one match finds all the matched descriptors
+            if self.wildcard_match_regex is None:
+                patterns = ['(?=(?P<d{}>{})$|)'.format(idx, _build_match_pattern(descriptor.name.type_name_template))
+                            for idx, descriptor in enumerate(self.wildcard_match)]
+                self.wildcard_match_regex = re.compile(''.join(patterns), re.DOTALL)
+                # indices of the descriptor groups in the tuple of groups of a match
+                self.wildcard_match_groups = [self.wildcard_match_regex.groupindex['d{}'.format(idx)] - 1
+                                              for idx in range(len(self.wildcard_match))]
+            return self.wildcard_match_regex, self.wildcard_match_groups
+
     def __init__(self, logger=None):
         self._logger = logger
         self._types = defaultdict(TypeVizStorage.Item)
 
     def add_type(self, type_viz: TypeViz):
-        for type_viz_name in type_viz.type_viz_names:
-            key: str = _build_key(type_viz_name.type_name_template)
-            if type_viz_name.has_wildcard:
-                regex = "^" + _build_regex(type_viz_name.type_name_template) + "$"
+        self.add_types([type_viz])
+
+    def add_types(self, type_vizs: Iterable[TypeViz], keys=None):
+        # descriptors are collected first, then the specificity graph of every touched bucket is extended once
+        wildcard_indices = {}
+        exact_indices = {}
+        first_new_indices = {}
+        for type_viz in type_vizs:
+            for type_viz_name in type_viz.type_viz_names:
+                key: str = _build_key(type_viz_name.type_name_template)
+                if keys is not None and key not in keys:
+                    continue
                 item = self._types[key]
                 item.descriptors_was_sorted = False
-
-                descriptor_found = False
-                for descriptor in item.wildcard_match:
-                    if descriptor.regex == regex:
-                        descriptor.visualizers.append(type_viz)
-                        descriptor_found = True
-                        break
-
-                if descriptor_found:
+                if type_viz_name.has_wildcard:
+                    regex = "^" + _build_regex(type_viz_name.type_name_template) + "$"
+                    descriptors = item.wildcard_match
+                    indices = wildcard_indices
+                    if key not in first_new_indices:
+                        first_new_indices[key] = len(descriptors)
+                else:
+                    regex = str(type_viz_name.type_name_template)
+                    descriptors = item.exact_match
+                    indices = exact_indices
+
+                index = indices.get(key)
+                if index is None:
+                    index = indices[key] = {descriptor.regex: descriptor for descriptor in descriptors}
+
+                descriptor = index.get(regex)
+                if descriptor is not None:
+                    descriptor.visualizers.append(type_viz)
                     continue
 
-                descriptor_to_add = TypeVizDescriptor(type_viz_name, regex, type_viz)
-                for descriptor in item.wildcard_match:
-                    if descriptor.name.type_name_template.match(type_viz_name.type_name_template, None, None):
-                        descriptor.more_specific_descriptors.append(descriptor_to_add)
-                    elif type_viz_name.type_name_template.match(descriptor.name.type_name_template, None, None):
-                        descriptor_to_add.more_specific_descriptors.append(descriptor)
+                descriptor = TypeVizDescriptor(type_viz_name, regex, type_viz)
+                index[regex] = descriptor
+                descriptors.append(descriptor)
 
-                item.wildcard_match.append(descriptor_to_add)
-            else:
-                type_name = str(type_viz_name.type_name_template)
-                item = self._types[key]
-                item.descriptors_was_sorted = False
-                descriptor_found = False
-                for descriptor in item.exact_match:
-                    if descriptor.regex == type_name:
-                        descriptor.visualizers.append(type_viz)
-                        descriptor_found = True
-                        break
-
-                if descriptor_found:
-                    continue
+        for key, first_new_index in first_new_indices.items():
+            _add_more_specific_descriptors(self._types[key].wildcard_match, first_new_index)
 
-                descriptor_to_add = TypeVizDescriptor(type_viz_name, type_name, type_viz)
-                item.exact_match.append(descriptor_to_add)
+    def update_types(self, changed_types: Iterable[TypeViz], type_vizs: Iterable[TypeViz]):
+        # Buckets of the changed types are rebuilt from all the types of the storage in their registration order,
+        # so the storage ends up the same as if the types were added to an empty one
+        type_vizs = list(type_vizs)
+        changed_keys = {_build_key(type_viz_name.type_name_template) for type_viz in changed_types
+                        for type_viz_name in type_viz.type_viz_names}
+        old_types = self._types
+        self._types = defaultdict(TypeVizStorage.Item)
+        for type_viz in type_vizs:
+            for type_viz_name in type_viz.type_viz_names:
+                key = _build_key(type_viz_name.type_name_template)
+                if key in self._types:
+                    continue
+                if key in changed_keys or key not in old_types:
+                    changed_keys.add(key)
+                    self._types[key] = TypeVizStorage.Item()
+                else:
+                    self._types[key] = old_types[key]
+        self.add_types(type_vizs, changed_keys)
 
     def iterate_exactly_matched_type_viz(self):
         for item in six.itervalues(self._types):
@@ -123,7 +163,7 @@ class TypeVizStorage(object):
                 for visualizer in descriptor.visualizers:
                     yield descriptor.regex, visualizer, descriptor.name
 
-    def get_matched_types(self, type_name_template):
+    def get_matched_types(self, type_name_template, use_regex=False, verify_regex=False):
         key = _build_key(type_name_template)
         item = self._types.get(key)
         if item:
@@ -134,11 +174,131 @@ class TypeVizStorage(object):
                     for visualizer in match.visualizers:
                         yield visualizer, match.name
 
-            for match in item.wildcard_match:
-                wildcard = match.name.type_name_template
-                if wildcard.match(type_name_template, None, self._logger):
-                    for visualizer in match.visualizers:
-                        yield visualizer, match.name
+            if use_regex:
+                matches = self._get_wildcard_matches_by_regex(item, type_name_template, verify_regex)
+            else:
+                matches = [match for match in item.wildcard_match if
+                           match.name.type_name_template.match(type_name_template, None, self._logger)]
+            for match in matches:
+                for visualizer in match.visualizers:
+                    yield visualizer, match.name
+
+    def _get_wildcard_matches_by_regex(self, item, type_name_template, verify):
+        if not item.wildcard_match:
+            return []
+        regex, descriptor_groups = item.get_wildcard_match_regex()
+        groups = regex.match(_serialize_for_matching(type_name_template)).groups()
+        matches = [descriptor for descriptor, group_idx in zip(item.wildcard_match, descriptor_groups)
+                   if groups[group_idx] is not None]
+        if not verify:
+            return matches
+
+        for descriptor, group_idx in zip(item.wildcard_match, descriptor_groups):
+            if groups[group_idx] is not None:
+                wildcards_count = _count_wildcards(descriptor.name.type_name_template)
+                captures = groups[group_idx + 1:group_idx + 1 + wildcards_count]
+                self._verify_regex_match(descriptor, type_name_template, captures)
+            elif descriptor.name.type_name_template.match(type_name_template):
+                self._log("Regex matching missed '{}' for '{}'", descriptor.name, type_name_template)
+        return matches
+
+    def _verify_regex_match(self, descriptor, type_name_template, captures):
+        matched_args = []
+        if not descriptor.name.type_name_template.match(type_name_template, matched_args):
+            self._log("Regex matching wrongly matched '{}' for '{}'", descriptor.name, type_name_template)
+            return
+        captured = ','.join(capture.translate(_MATCH_MARKERS_REMOVAL) for capture in captures)
+        expected = ','.join(str(arg) for arg in matched_args)
+        if captured != expected:
+            self._log("Regex matching of '{}' for '{}' captured '{}' instead of '{}'", descriptor.name,
+                      type_name_template, captured, expected)
+
+    def _log(self, fmt, *args):
+        if self._logger:
+            self._logger >> fmt.format(*args)
+
+
+def _add_more_specific_descriptors(descriptors: List[TypeVizDescriptor], first_new_index: int):
+    # A wildcard can only match names with the same template name and, unless its first argument is a wildcard,
+    # the same name of the first argument. Descriptors are linked in the order they were added.
+    groups = defaultdict(list)
+    for index, descriptor in enumerate(descriptors):
+        groups[descriptor.name.type_name_template.name].append(index)
+
+    for group in six.itervalues(groups):
+        by_first_arg = defaultdict(list)
+        for index in group:
+            template = descriptors[index].name.type_name_template
+            by_first_arg[template.args[0].name if template.args else None].append(index)
+
+        for index in group:
+            descriptor = descriptors[index]
+            template = descriptor.name.type_name_template
+            candidates = group
+            if template.args and not template.args[0].is_wildcard:
+                candidates = by_first_arg.get(template.args[0].name, [])
+
+            if index < first_new_index:
+                # old descriptors are already linked with each other
+                candidates = candidates[bisect.bisect_left(candidates, first_new_index):]
+            for other_index in candidates:
+                if other_index == index:
+                    continue
+                other = descriptors[other_index]
+                if not template.match(other.name.type_name_template, None, None):
+                    continue
+                if other_index < index and other.name.type_name_template.match(template, None, None):
+                    continue
+                descriptor.more_specific_descriptors.append(other)
+
+
+# Type names are matched by regexes in a serialized form where every template argument is enclosed into
+# marker characters of its nesting depth, so a wildcard can't capture a part of another argument
+_MATCH_MARKERS_BASE = 0xE000
+_MATCH_MARKERS_REMOVAL = {code: None for code in range(_MATCH_MARKERS_BASE, _MATCH_MARKERS_BASE + 0x1000)}
+
+
+def _get_match_markers(depth):
+    return chr(_MATCH_MARKERS_BASE + 2 * depth), chr(_MATCH_MARKERS_BASE + 2 * depth + 1)
+
+
+def _serialize_for_matching(type_name_template: TypeNameTemplate, depth=0):
+    if not type_name_template.args:
+        return type_name_template.name
+    open_marker, close_marker = _get_match_markers(depth)
+    pieces = type_name_template.fmt.split('{}')
+    result = [pieces[0]]
+    for arg, piece in zip(type_name_template.args, pieces[1:]):
+        result.append(open_marker + _serialize_for_matching(arg, depth + 1) + close_marker + piece)
+    return ''.join(result)
+
+
+def _build_match_pattern(type_name_template: TypeNameTemplate, depth=0):
+    if type_name_template.is_wildcard:
+        return '(.*)'
+    if not type_name_template.args:
+        return re.escape(type_name_template.name)
+    open_marker, close_marker = _get_match_markers(depth)
+    pieces = type_name_template.fmt.split('{}')
+    result = [re.escape(pieces[0])]
+    last_idx = len(type_name_template.args) - 1
+    for idx, (arg, piece) in enumerate(zip(type_name_template.args, pieces[1:])):
+        if not arg.is_wildcard:
+            arg_pattern = _build_match_pattern(arg, depth + 1)
+        elif idx == last_idx:
+            # the last wildcard also captures the rest of arguments, but never leaves the enclosing argument
+            outer_markers = ''.join(''.join(_get_match_markers(outer_depth)) for outer_depth in range(depth))
+            arg_pattern = '([^{}]*)'.format(outer_markers) if outer_markers else '(.*)'
+        else:
+            arg_pattern = '([^{}]*)'.format(close_marker)
+        result.append(open_marker + arg_pattern + close_marker + re.escape(piece))
+    return ''.join(result)
+
+
+def _count_wildcards(type_name_template: TypeNameTemplate):
+    if type_name_template.is_wildcard:
+        return 1
+    return sum(_count_wildcards(arg) for arg in type_name_template.args)
 
 
 def _build_key(type_name_template: TypeNameTemplate):
@@ -4,6 +4,8 @@ from .type_viz_mixins import TypeVizItemConditionalNodeMixin, TypeVizItemOptiona
 
 class TypeVizSummary(TypeVizItemConditionalNodeMixin,
                      TypeVizItemOptionalNodeMixin):
+    __slots__ = ('condition', 'optional', 'value')
+
     def __init__(self, value, condition=None, optional=False):
         super(TypeVizSummary, self).__init__(condition=condition, optional=optional)
         assert isinstance(value, TypeVizInterpolatedString)
@@ -0,0 +1,29 @@
+import unittest
+
+from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template, normalize_type_name
+
+# Run from bin/helpers:
+#   python3 -m unittest tests.test_type_name_parser
+
+# spelling of natvis files and the same type as LLDB reports it
+FUNCTION_SIGNATURES = [
+    ('std::function<void (int, char)>', 'std::function<void (int, char)>'),
+    ('std::function<int (*)(const char *, unsigned long)>', 'std::function<int (*)(const char *, unsigned long)>'),
+    ('Foo<void (Bar::*)(int, X) const>', 'Foo<void (Bar::*)(int, X) const>'),
+    ('std::function<void (A, B)>', 'std::function<void (struct A, class B)>'),
+    ('std::map<std::string,std::function<bool (int)>>', 'std::map<std::string, std::function<bool (int)> >'),
+]
+
+
+class TypeNameParserTest(unittest.TestCase):
+    def test_function_signatures_round_trip(self):
+        for natvis_name, lldb_name in FUNCTION_SIGNATURES:
+            with self.subTest(lldb_name):
+                printed = str(parse_type_name_template(lldb_name))
+                self.assertEqual(normalize_type_name(lldb_name), printed)
+                self.assertEqual(printed, str(parse_type_name_template(printed)))
+                self.assertEqual(str(parse_type_name_template(natvis_name)), printed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,3 +5,5 @@ lldb.debugger.HandleCommand('command script import jb_lldb_stepping')
 
 # And then enable our formatters
 lldb.debugger.CreateCategory('jb_formatters').SetEnabled(True)
+# Enabled later, so it goes before jb_formatters and native summary strings override python summaries
+lldb.debugger.CreateCategory('jb_native_summaries').SetEnabled(True)
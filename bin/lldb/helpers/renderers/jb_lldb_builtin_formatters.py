@@ -64,6 +64,46 @@ class PointerChildrenProvider(AbstractChildrenProvider):
         return self.pointee
 
 
+TRUNCATED_CHILDREN_MARKER_NAME = '[...]'
+TRUNCATED_CHILDREN_MARKER_TEXT = 'time budget exceeded'
+
+
+class TruncatedChildrenProvider(AbstractChildrenProvider):
+    # children collected before the time budget ran out, followed by a marker child
+    def __init__(self, value_non_synth: lldb.SBValue, children_provider: AbstractChildrenProvider):
+        self.children_provider = children_provider
+        self.marker_index = children_provider.num_children()
+        self.marker = _create_truncation_marker(value_non_synth)
+
+    def num_children(self) -> int:
+        return self.marker_index + 1 if self.marker.IsValid() else self.marker_index
+
+    def get_child_index(self, name) -> int:
+        if name == TRUNCATED_CHILDREN_MARKER_NAME and self.marker.IsValid():
+            return self.marker_index
+        return self.children_provider.get_child_index(name)
+
+    def get_child_at_index(self, index):
+        if index == self.marker_index:
+            return self.marker if self.marker.IsValid() else None
+        return self.children_provider.get_child_at_index(index)
+
+    def get_children_range(self, start, count):
+        children = self.children_provider.get_children_range(start, max(min(count, self.marker_index - start), 0))
+        if start <= self.marker_index < start + count and self.marker.IsValid():
+            children.append(self.marker)
+        return children
+
+
+def _create_truncation_marker(value: lldb.SBValue) -> lldb.SBValue:
+    # the marker is made from data, so it needs no expression evaluation
+    target = value.GetTarget()
+    text = TRUNCATED_CHILDREN_MARKER_TEXT
+    data = lldb.SBData.CreateDataFromCString(target.GetByteOrder(), target.GetAddressByteSize(), text)
+    marker_type = target.GetBasicType(lldb.eBasicTypeChar).GetArrayType(len(text))
+    return value.CreateValueFromData(TRUNCATED_CHILDREN_MARKER_NAME, data, marker_type)
+
+
 class NumberVisDescriptor(AbstractVisDescriptor):
     numeric_types = {"bool", "short", "unsigned short", "int", "unsigned int", "unsigned", "long", "unsigned long",
                      "long long", "unsigned long long", "__int128", "unsigned __int128", "half", "float", "double",
@@ -264,6 +304,7 @@ class CharArrayOrPointerVisDescriptor(AbstractVisDescriptor):
         if err.Fail():
             stream.output('<error>')
             return
+        stream.record_memory_region(address, len(content) + (char_size if zero_found else 0))
 
         if enc == '__locale__':
             enc = get_locale()
@@ -1,10 +1,19 @@
 import distutils.util
+import functools
+import hashlib
 import importlib
 import inspect
+import itertools
+import json
+import os
 import shlex
+import time
 import traceback
+from collections import OrderedDict
+from typing import List, Optional
 
-from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template
+from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template, get_type_name_cache_info, \
+    clear_type_name_cache
 
 import lldb
 
@@ -14,10 +23,40 @@ from renderers.jb_lldb_declarative_formatters_manager import *
 from renderers.jb_lldb_utils import *
 from renderers.jb_lldb_builtin_formatters import *
 from renderers.jb_lldb_format import update_value_dynamic_state
-from renderers.jb_lldb_natvis_formatters import NatVisDescriptor
+from renderers.jb_lldb_natvis_formatters import NatVisDescriptor, clear_failed_candidates_cache, clear_children_cache, \
+    update_failed_candidates_modules
+from renderers.jb_lldb_native_summaries import *
+from renderers.jb_lldb_fingerprint_cache import FingerprintCache
+from renderers.jb_lldb_prefetch import run_prefetch, is_prefetching
+from renderers.jb_lldb_file_watcher import start_watching, stop_watching, set_watched_files, take_changed_files
 
 lldb_formatters_manager: FormattersManager
 
+SUMMARY_CACHE_MAX_SIZE = 4096
+# Summaries of values in memory kept between stops
+g_summary_cache = FingerprintCache(SUMMARY_CACHE_MAX_SIZE)
+
+CHILDREN_PAGE_PROVIDERS_MAX_SIZE = 64
+# Prepared synthetic providers of values paged by get_children_page, so a page doesn't walk lists and trees
+# from the beginning again. By (process, stop, load address, type name, format, array size).
+g_children_page_providers = OrderedDict()
+
+# children counted for every variable of get_frame_summaries, more are reported by 'has_more_children'
+FRAME_SUMMARIES_CHILDREN_LIMIT = 16
+
+PREFETCH_CHILDREN_PAGE_SIZE = 100
+# seconds the stop hook may delay reporting of the stop by, it is paid on every stop
+PREFETCH_TIME_BUDGET = 0.02
+# Targets the stop hook applying changes of files and prefetching values is added to
+g_stop_hook_targets = []
+
+TIMEOUT_MARKER = '...<timeout>'
+# Results of renderings stopped by their time budgets are reused until the process stops again,
+# by (load address, type name, format, array size)
+g_timed_out_stop = None
+g_timed_out_summaries = {}
+g_timed_out_children = {}
+
 
 def __lldb_init_module(debugger: lldb.SBDebugger, internal_dict):
     log('JetBrains declarative formatters LLDB module registered into {}', str(debugger))
@@ -37,16 +76,29 @@ def __lldb_init_module(debugger: lldb.SBDebugger, internal_dict):
         make_absolute_name(__name__, '_cmd_override_charset'): 'jb_renderers_override_charset',
         make_absolute_name(__name__, '_cmd_set_markup'): 'jb_renderers_set_markup',
         make_absolute_name(__name__, '_cmd_set_global_hex'): 'jb_renderers_set_global_hex',
+        make_absolute_name(__name__, '_cmd_set_targeted_registration'): 'jb_renderers_set_targeted_registration',
+        make_absolute_name(__name__, '_cmd_set_native_summaries'): 'jb_renderers_set_native_summaries',
+        make_absolute_name(__name__, '_cmd_native_summaries_report'): 'jb_renderers_native_summaries_report',
+        make_absolute_name(__name__, '_cmd_set_summary_cache'): 'jb_renderers_set_summary_cache',
+        make_absolute_name(__name__, '_cmd_summary_cache_stats'): 'jb_renderers_summary_cache_stats',
+        make_absolute_name(__name__, '_cmd_set_children_cache'): 'jb_renderers_set_children_cache',
+        make_absolute_name(__name__, '_cmd_children'): 'jb_renderers_children',
+        make_absolute_name(__name__, '_cmd_frame_summaries'): 'jb_renderers_frame_summaries',
+        make_absolute_name(__name__, '_cmd_set_prefetch'): 'jb_renderers_set_prefetch',
+        make_absolute_name(__name__, '_cmd_set_time_budgets'): 'jb_renderers_set_time_budgets',
+        make_absolute_name(__name__, '_cmd_set_parse_processes'): 'jb_renderers_set_parse_processes',
+        make_absolute_name(__name__, '_cmd_set_type_matching'): 'jb_renderers_set_type_matching',
+        make_absolute_name(__name__, '_cmd_set_file_watching'): 'jb_renderers_set_file_watching',
+        make_absolute_name(__name__, '_cmd_apply_file_changes'): 'jb_renderers_apply_file_changes',
     }
     register_lldb_commands(debugger, commands_list)
 
     summary_func_name = '{}.declarative_summary'.format(__name__)
     synth_class_name = '{}.DeclarativeSynthProvider'.format(__name__)
-    debugger.HandleCommand('type summary add -v -x ".*" -F {} -e --category jb_formatters'.format(summary_func_name))
-    debugger.HandleCommand('type synthetic add -x ".*" -l {} --category jb_formatters'.format(synth_class_name))
 
     global lldb_formatters_manager
     lldb_formatters_manager = FormattersManager(summary_func_name, synth_class_name)
+    _update_type_matchers(debugger)
 
     viz_provider = VizDescriptorProvider()
     set_viz_descriptor_provider(viz_provider)
@@ -109,7 +161,7 @@ def _cmd_loaders_list(debugger, command, exe_ctx, result, internal_dict):
 
 
 def _cmd_load(debugger, command, exe_ctx, result, internal_dict):
-    help_message = 'Usage: jb_renderers_load tag <loader_tag> <natvis_file_path>...'
+    help_message = 'Usage: jb_renderers_load tag <loader_tag> <natvis_file_path|directory|glob_pattern>...'
     cmd = shlex.split(command)
     if len(cmd) < 1:
         result.SetError('Loader tag expected.\n{}'.format(help_message))
@@ -122,12 +174,76 @@ def _cmd_load(debugger, command, exe_ctx, result, internal_dict):
         return
 
     file_paths = cmd[1:]
-    for filepath in file_paths:
-        try:
-            lldb_formatters_manager.register(filepath, loader)
-        except TypeVizLoaderException as e:
-            result.SetError('{}'.format(str(e)))
-            return
+    path_expander = type_viz_path_expander_get(loader)
+    try:
+        if path_expander is not None and any(_is_path_pattern(path) for path in file_paths):
+            result.AppendMessage(_load_expanded_paths(file_paths, loader, path_expander))
+        else:
+            lldb_formatters_manager.register_many(file_paths, loader, get_parse_process_count())
+    except TypeVizLoaderException as e:
+        result.SetError('{}'.format(str(e)))
+    finally:
+        _on_formatters_changed(debugger)
+
+
+def _is_path_pattern(path):
+    return os.path.isdir(path) or (not os.path.isfile(path) and any(c in path for c in '*?['))
+
+
+# Files of directories and glob patterns are registered one by one, in the same order as if they were listed
+# explicitly. Files with the same content are loaded once, registered files are updated instead of being reloaded.
+def _load_expanded_paths(paths, loader, path_expander) -> str:
+    start = time.perf_counter()
+    registered_files = set(lldb_formatters_manager.get_all_registered_files())
+    files_by_digest = {}
+    for filepath in registered_files:
+        files_by_digest.setdefault(_compute_file_digest(filepath), filepath)
+
+    new_files = []
+    updated_files = []
+    duplicates = []
+    for path in paths:
+        for filepath in path_expander(path) if _is_path_pattern(path) else [path]:
+            if filepath in registered_files:
+                if filepath not in updated_files:
+                    updated_files.append(filepath)
+                continue
+            digest = _compute_file_digest(filepath)
+            if digest is not None and digest in files_by_digest:
+                duplicates.append((filepath, files_by_digest[digest]))
+                continue
+            files_by_digest[digest] = filepath
+            new_files.append(filepath)
+
+    lldb_formatters_manager.register_many(new_files, loader, get_parse_process_count())
+    for filepath in updated_files:
+        lldb_formatters_manager.update(filepath)
+
+    types_count = sum(_count_types(lldb_formatters_manager.formatter_entries[filepath].storage)
+                      for filepath in new_files + updated_files)
+    lines = ['{} file(s) loaded, {} file(s) updated, {} duplicate(s) skipped, {} type(s) in {:.3f}s'.format(
+        len(new_files), len(updated_files), len(duplicates), types_count, time.perf_counter() - start)]
+    lines.extend("'{}' is the same as '{}'".format(duplicate, original) for duplicate, original in duplicates)
+    report = '\n'.join(lines)
+    log("{}", report)
+    return report
+
+
+def _compute_file_digest(filepath) -> Optional[bytes]:
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.digest()
+
+
+def _count_types(type_viz_storage) -> int:
+    visualizers = itertools.chain(type_viz_storage.iterate_exactly_matched_type_viz(),
+                                  type_viz_storage.iterate_wildcard_matched_type_viz())
+    return len({id(visualizer) for _, visualizer, _ in visualizers})
 
 
 def _cmd_remove(debugger, command, exe_ctx, result, internal_dict):
@@ -182,6 +298,8 @@ def _cmd_set_markup(debugger, command, exe_ctx, result, internal_dict):
         return
 
     enable_disable_formatting(enable)
+    # summary strings produce no markup
+    _reset_native_summaries(debugger)
 
 
 def _cmd_set_global_hex(debugger, command, exe_ctx, result, internal_dict):
@@ -200,6 +318,303 @@ def _cmd_set_global_hex(debugger, command, exe_ctx, result, internal_dict):
 
     set_global_hex(hex_enable)
     set_global_hex_show_both(hex_show_both)
+    # numbers are formatted by us only when they are shown in hex
+    _update_type_matchers(debugger)
+    _reset_native_summaries(debugger)
+
+
+def _cmd_set_targeted_registration(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_targeted_registration <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_targeted_registration(enable)
+    _update_type_matchers(debugger)
+
+
+def _cmd_set_native_summaries(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_native_summaries <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_native_summaries_enabled(enable)
+    _reset_native_summaries(debugger)
+
+
+def _cmd_native_summaries_report(debugger, command, exe_ctx, result, internal_dict):
+    result.AppendMessage(get_native_summaries_report())
+
+
+def _cmd_set_summary_cache(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_summary_cache <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_summary_cache_enabled(enable)
+    g_summary_cache.clear()
+
+
+def _cmd_summary_cache_stats(debugger, command, exe_ctx, result, internal_dict):
+    result.AppendMessage('Summary cache: {}'.format(g_summary_cache.get_stats()))
+    type_name_cache_info = get_type_name_cache_info()
+    result.AppendMessage('Type name cache: {} entries, {} hits, {} misses'.format(
+        type_name_cache_info.currsize, type_name_cache_info.hits, type_name_cache_info.misses))
+
+
+def _cmd_set_children_cache(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_children_cache <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_children_cache_enabled(enable)
+    clear_children_cache()
+
+
+def _cmd_children(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_children <expression> <start> <count>'
+    cmd = shlex.split(command)
+    if len(cmd) != 3:
+        result.SetError('Expression, start index and count are expected.\n{}'.format(help_message))
+        return
+
+    try:
+        start = int(cmd[1])
+        count = int(cmd[2])
+    except ValueError:
+        result.SetError('Integer start index and count are expected.\n{}'.format(help_message))
+        return
+
+    frame: lldb.SBFrame = exe_ctx.GetFrame()
+    if not frame.IsValid():
+        result.SetError('No selected frame.')
+        return
+
+    val: lldb.SBValue = frame.GetValueForVariablePath(cmd[0])
+    if not val.IsValid():
+        val = frame.EvaluateExpression(cmd[0])
+    if val.GetError().Fail():
+        result.SetError('Failed to evaluate \'{}\': {}'.format(cmd[0], val.GetError().GetCString()))
+        return
+
+    result.AppendMessage(json.dumps(get_children_page(val, start, count)))
+
+
+def _cmd_frame_summaries(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_frame_summaries [-t <time budget in milliseconds>] [<variable path>...]'
+    cmd = shlex.split(command)
+    time_budget = None
+    if cmd and cmd[0] == '-t':
+        try:
+            time_budget = int(cmd[1]) / 1000
+        except (IndexError, ValueError):
+            result.SetError('Integer time budget is expected.\n{}'.format(help_message))
+            return
+        cmd = cmd[2:]
+
+    frame: lldb.SBFrame = exe_ctx.GetFrame()
+    if not frame.IsValid():
+        result.SetError('No selected frame.')
+        return
+
+    result.AppendMessage(json.dumps(get_frame_summaries(frame, cmd or None, time_budget)))
+
+
+def _cmd_set_prefetch(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_prefetch <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_prefetch_enabled(enable)
+    if enable:
+        _ensure_stop_hook(debugger.GetSelectedTarget())
+
+
+def _cmd_set_type_matching(debugger, command, exe_ctx, result, internal_dict):
+    engines = {'structural': TypeMatchingEngine.STRUCTURAL, 'regex': TypeMatchingEngine.REGEX,
+               'regex-verified': TypeMatchingEngine.REGEX_VERIFIED}
+    help_message = 'Usage: jb_renderers_set_type_matching <{}>'.format('|'.join(engines))
+    cmd = shlex.split(command)
+    if len(cmd) != 1 or cmd[0] not in engines:
+        result.SetError('Type matching engine is expected.\n{}'.format(help_message))
+        return
+
+    set_type_matching_engine(engines[cmd[0]])
+    get_viz_descriptor_provider().clear_cache()
+
+
+def _cmd_set_file_watching(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_file_watching <value>'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        enable = bool(distutils.util.strtobool(cmd[0]))
+    except Exception as e:
+        result.SetError('Boolean value is expected.\n{}'.format(help_message))
+        return
+
+    set_file_watching_enabled(enable)
+    if enable:
+        set_watched_files(lldb_formatters_manager.get_all_registered_files())
+        start_watching()
+        _ensure_stop_hook(debugger.GetSelectedTarget())
+    else:
+        stop_watching()
+
+
+def _cmd_apply_file_changes(debugger, command, exe_ctx, result, internal_dict):
+    result.AppendMessage(apply_file_changes(debugger))
+
+
+def _cmd_set_parse_processes(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_parse_processes <count>\n' \
+                   '1 parses files in the debugger process'
+    cmd = shlex.split(command)
+    if len(cmd) != 1:
+        result.SetError('Process count is expected.\n{}'.format(help_message))
+        return
+
+    try:
+        process_count = int(cmd[0])
+    except ValueError:
+        result.SetError('Integer process count is expected.\n{}'.format(help_message))
+        return
+
+    set_parse_process_count(max(process_count, 1))
+
+
+def _cmd_set_time_budgets(debugger, command, exe_ctx, result, internal_dict):
+    help_message = 'Usage: jb_renderers_set_time_budgets <summary milliseconds> <expansion milliseconds>\n' \
+                   '0 disables the time budget'
+    cmd = shlex.split(command)
+    if len(cmd) != 2:
+        result.SetError('Two time budgets are expected.\n{}'.format(help_message))
+        return
+
+    try:
+        summary_time_budget = int(cmd[0])
+        expansion_time_budget = int(cmd[1])
+    except ValueError:
+        result.SetError('Integer time budgets are expected.\n{}'.format(help_message))
+        return
+
+    set_summary_time_budget(summary_time_budget / 1000 if summary_time_budget > 0 else None)
+    set_expansion_time_budget(expansion_time_budget / 1000 if expansion_time_budget > 0 else None)
+    g_timed_out_summaries.clear()
+    g_timed_out_children.clear()
+
+
+def _ensure_stop_hook(target: lldb.SBTarget):
+    if not target.IsValid() or any(hooked_target == target for hooked_target in g_stop_hook_targets):
+        return
+    g_stop_hook_targets.append(target)
+
+    log("Adding stop hook to target '{}'...", str(target))
+    interpreter: lldb.SBCommandInterpreter = target.GetDebugger().GetCommandInterpreter()
+    result = lldb.SBCommandReturnObject()
+    interpreter.HandleCommand('target stop-hook add -P {}.RenderersStopHook'.format(__name__),
+                              lldb.SBExecutionContext(target), result)
+    if not result.Succeeded():
+        log("Adding stop hook failed: {}", result.GetError())
+
+
+class RenderersStopHook(object):
+    def __init__(self, target, extra_args, internal_dict):
+        pass
+
+    def handle_stop(self, exe_ctx: lldb.SBExecutionContext, stream):
+        if is_file_watching_enabled():
+            apply_file_changes(exe_ctx.GetTarget().GetDebugger())
+        if is_prefetch_enabled():
+            _prefetch_frame(exe_ctx.GetFrame())
+        return True
+
+
+def _prefetch_frame(frame: lldb.SBFrame):
+    # results are useful only if they are kept until the IDE asks for them
+    if not frame.IsValid() or not (is_summary_cache_enabled() or is_children_cache_enabled()):
+        return
+
+    # summaries of the visible variables go first, then their children in the same order
+    values = list(frame.GetVariables(True, True, False, True))
+    tasks = []
+    if is_summary_cache_enabled():
+        tasks.extend(functools.partial(declarative_summary, val, None) for val in values)
+    tasks.extend(functools.partial(get_children_page, val, 0, PREFETCH_CHILDREN_PAGE_SIZE) for val in values)
+    run_prefetch(tasks, PREFETCH_TIME_BUDGET)
+
+
+def apply_file_changes(debugger) -> str:
+    changed_files = [filepath for filepath in take_changed_files()
+                     if filepath in lldb_formatters_manager.get_all_registered_files()]
+    if not changed_files:
+        return 'No changed files'
+
+    lines = []
+    for filepath in changed_files:
+        start = time.perf_counter()
+        try:
+            changed_types = lldb_formatters_manager.update(filepath)
+        except Exception as e:
+            # the file may be saved in the middle of editing, the types loaded before are kept
+            log("Updating '{}' failed: {}", filepath, e)
+            lines.append("'{}': update failed: {}".format(filepath, e))
+            continue
+        changes = 'reloaded' if changed_types is None else '{} type(s) changed'.format(len(changed_types))
+        lines.append("'{}': {} in {:.3f}s".format(filepath, changes, time.perf_counter() - start))
+    _on_formatters_changed(debugger)
+
+    report = '\n'.join(lines)
+    log("{}", report)
+    return report
+
+
+def _reset_native_summaries(debugger):
+    unregister_native_summaries(debugger)
+    # types are offloaded when their visualizers are looked up
+    get_viz_descriptor_provider().clear_cache()
 
 
 def remove_all(debugger):
@@ -215,11 +630,74 @@ def reload_all(debugger):
 def remove_file_list(debugger, files):
     for filepath in files:
         lldb_formatters_manager.unregister(filepath)
+    _on_formatters_changed(debugger)
 
 
 def reload_file_list(debugger, files):
-    for filepath in files:
-        lldb_formatters_manager.reload(filepath)
+    lldb_formatters_manager.reload_many(list(files), get_parse_process_count())
+    _on_formatters_changed(debugger)
+
+
+def _on_formatters_changed(debugger):
+    # visualizers found for types before may be gone or not the best match anymore
+    get_viz_descriptor_provider().clear_cache()
+    # new visualizers may reference different members, failures recorded for the old ones are irrelevant
+    clear_failed_candidates_cache()
+    unregister_native_summaries(debugger)
+    g_summary_cache.clear()
+    clear_children_cache()
+    g_children_page_providers.clear()
+    g_timed_out_summaries.clear()
+    g_timed_out_children.clear()
+    # names of types from the files gone would stay in the cache until they are pushed out
+    clear_type_name_cache()
+    _update_type_matchers(debugger)
+    if is_file_watching_enabled():
+        set_watched_files(lldb_formatters_manager.get_all_registered_files())
+
+
+def _update_type_matchers(debugger):
+    lldb_formatters_manager.set_type_matchers(debugger, _collect_type_matchers())
+
+
+def _collect_type_matchers():
+    # By default every value goes through our formatters. In targeted mode only types which may have natvis or
+    # builtin visualizers are matched, everything else is left to the LLDB's native formatting.
+    # Note that targeted mode loses natvis visualizers inherited from base classes for types matched by nothing else.
+    if not is_targeted_registration():
+        return [('.*', True)]
+
+    # pointers and references to matched types are matched by LLDB itself
+    type_names = set(CharVisDescriptor.char_types)
+    if is_global_hex():
+        type_names.update(NumberVisDescriptor.numeric_types)
+
+    template_names = set()
+    for type_viz_storage in lldb_formatters_manager.get_all_type_viz():
+        for _, _, type_viz_name in itertools.chain(type_viz_storage.iterate_exactly_matched_type_viz(),
+                                                   type_viz_storage.iterate_wildcard_matched_type_viz()):
+            type_name_template = type_viz_name.type_name_template
+            if type_name_template.is_wildcard:
+                return [('.*', True)]
+            idx_template_args = type_name_template.name.find('<')
+            if idx_template_args == -1:
+                type_names.add(type_name_template.name)
+            else:
+                # template arguments are spelled differently by natvis authors and compilers, match by name only
+                template_names.add(type_name_template.name[:idx_template_args])
+
+    char_types = '|'.join(_escape_type_name_regex(name) for name in sorted(CharVisDescriptor.char_types))
+    type_matchers = [(name, False) for name in sorted(type_names)]
+    type_matchers.extend(('^{}<'.format(_escape_type_name_regex(name)), True) for name in sorted(template_names))
+    type_matchers.append(
+        ('^((const|volatile) )*({})( (const|volatile))* ?[[][[:digit:]]*[]]$'.format(char_types), True))
+    type_matchers.append(('<lambda_[[:alnum:]]+>$', True))
+    return type_matchers
+
+
+def _escape_type_name_regex(type_name):
+    # LLDB uses POSIX extended regular expressions, bracket expressions need no backslashes inside command quotes
+    return ''.join('[{}]'.format(c) if c in '.[]()*+?{}|$' else c for c in type_name)
 
 
 def declarative_summary(val: lldb.SBValue, internal_dict):
@@ -227,12 +705,12 @@ def declarative_summary(val: lldb.SBValue, internal_dict):
         update_value_dynamic_state(val)
         val_non_synth = val.GetNonSyntheticValue()
         target = val_non_synth.GetTarget()
-        is64bit: bool = target.GetAddressByteSize() == 8
+        _update_target_modules(target)
+        register_pending_native_summaries(target.GetDebugger())
+        if is_prefetch_enabled():
+            _ensure_stop_hook(target)
         set_max_string_length(get_max_string_summary_length(target.GetDebugger()))
-        stream_type = is_enabled_formatting() and FormattedStream or Stream
-        stream: Stream = stream_type(is64bit, get_recursion_level())
-        stream.output_object(val_non_synth)
-        return str(stream)
+        return _output_summary(val_non_synth, target)
 
     except IgnoreSynthProvider:
         return ''
@@ -242,6 +720,195 @@ def declarative_summary(val: lldb.SBValue, internal_dict):
         return ''
 
 
+def _output_summary(val_non_synth: lldb.SBValue, target: lldb.SBTarget, memo: Optional[SummaryMemo] = None) -> str:
+    is64bit: bool = target.GetAddressByteSize() == 8
+    stream_type = is_enabled_formatting() and FormattedStream or Stream
+    stream: Stream = stream_type(is64bit, get_recursion_level(), memo=memo)
+    time_budget = get_summary_time_budget()
+    if time_budget is None:
+        return _output_summary_to_stream(val_non_synth, stream)
+
+    timed_out_key = _get_timed_out_key(val_non_synth)
+    summary = g_timed_out_summaries.get(timed_out_key) if timed_out_key is not None else None
+    if summary is not None:
+        return summary
+
+    prev_deadline = set_deadline(get_deadline_for_time_budget(time_budget))
+    try:
+        return _output_summary_to_stream(val_non_synth, stream)
+    except RenderingTimeoutError:
+        log("Summary of value named '{}' has been truncated: time budget exceeded", val_non_synth.GetName())
+        stream.output(TIMEOUT_MARKER)
+        summary = str(stream)
+        if timed_out_key is not None and not is_prefetching():
+            g_timed_out_summaries[timed_out_key] = summary
+        return summary
+    finally:
+        set_deadline(prev_deadline)
+
+
+def _output_summary_to_stream(val_non_synth: lldb.SBValue, stream: Stream) -> str:
+    if is_summary_cache_enabled():
+        return _output_summary_cached(val_non_synth, stream)
+    stream.output_object(val_non_synth)
+    return str(stream)
+
+
+def _get_timed_out_key(val_non_synth: lldb.SBValue):
+    global g_timed_out_stop
+    process: lldb.SBProcess = val_non_synth.GetProcess()
+    stop = (process.GetUniqueID(), process.GetStopID())
+    if stop != g_timed_out_stop:
+        g_timed_out_summaries.clear()
+        g_timed_out_children.clear()
+        g_timed_out_stop = stop
+
+    address = val_non_synth.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return None
+    format_spec = val_non_synth.GetFormat()
+    array_size = val_non_synth.GetFormatAsArraySize() if format_spec & eFormatAsArray else None
+    return address, val_non_synth.GetTypeName(), format_spec, array_size
+
+
+# Summaries and children counts of all variables of the frame (or of the given variable paths) at once.
+# Debugger settings are read once and objects met in several variables are rendered once.
+def get_frame_summaries(frame: lldb.SBFrame, variable_paths: Optional[List[str]] = None,
+                        time_budget: Optional[float] = None) -> dict:
+    target: lldb.SBTarget = frame.GetThread().GetProcess().GetTarget()
+    _update_target_modules(target)
+    register_pending_native_summaries(target.GetDebugger())
+    set_max_string_length(get_max_string_summary_length(target.GetDebugger()))
+    # summary cache tracks memory of every summary separately, the shared memo would hide it
+    memo = SummaryMemo() if not is_summary_cache_enabled() else None
+
+    if variable_paths is None:
+        values = list(frame.GetVariables(True, True, False, True))
+        names = [val.GetName() for val in values]
+    else:
+        values = [frame.GetValueForVariablePath(path) for path in variable_paths]
+        names = variable_paths
+
+    entries = []
+    complete = True
+    # the deadline also stops evaluation inside a single slow variable
+    prev_deadline = set_deadline(get_deadline_for_time_budget(time_budget)) if time_budget is not None else None
+    try:
+        for name, val in zip(names, values):
+            entry = {'name': name}
+            entries.append(entry)
+            if is_deadline_exceeded():
+                complete = False
+                continue
+            if not val.IsValid() or val.GetError().Fail():
+                entry['error'] = val.GetError().GetCString() or 'Invalid value'
+                continue
+
+            try:
+                update_value_dynamic_state(val)
+                entry['summary'] = _output_summary(val.GetNonSyntheticValue(), target, memo)
+                if entry['summary'].endswith(TIMEOUT_MARKER):
+                    complete = False
+                # lists and trees are walked up to the limit only, the variable is expanded by get_children_page
+                num_children = DeclarativeSynthProvider(val, None).num_children_capped(FRAME_SUMMARIES_CHILDREN_LIMIT)
+                entry['num_children'] = min(num_children, FRAME_SUMMARIES_CHILDREN_LIMIT)
+                entry['has_more_children'] = num_children > FRAME_SUMMARIES_CHILDREN_LIMIT
+                if is_deadline_exceeded():
+                    complete = False
+            except IgnoreSynthProvider:
+                entry['summary'] = ''
+            except RenderingTimeoutError:
+                log("Summary of variable '{}' has been truncated: time budget exceeded", name)
+                entry.setdefault('summary', TIMEOUT_MARKER)
+                complete = False
+            except Exception as e:
+                if not g_force_suppress_errors:
+                    raise
+                entry['error'] = str(e)
+    finally:
+        if time_budget is not None:
+            set_deadline(prev_deadline)
+
+    return {'values': entries, 'complete': complete}
+
+
+def _output_summary_cached(val_non_synth: lldb.SBValue, stream: Stream) -> str:
+    address = val_non_synth.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        stream.output_object(val_non_synth)
+        return str(stream)
+
+    process: lldb.SBProcess = val_non_synth.GetProcess()
+    format_spec = val_non_synth.GetFormat()
+    array_size = val_non_synth.GetFormatAsArraySize() if format_spec & eFormatAsArray else None
+    key = (process.GetUniqueID(), address, val_non_synth.GetTypeName(), format_spec, array_size, stream.level,
+           is_enabled_formatting(), get_max_string_length(), is_global_hex(), is_global_hex_show_both(), get_locale())
+    summary = g_summary_cache.get(key, process)
+    if summary is not None:
+        return summary
+
+    # values are rendered from memory of the objects and strings met in the summary
+    # and of the values expressions evaluate to
+    stream.memo.regions = []
+    prev_memo = set_recording_memo(stream.memo)
+    try:
+        stream.output_object(val_non_synth)
+    finally:
+        set_recording_memo(prev_memo)
+    summary = str(stream)
+    if stream.memo.untracked:
+        log("Summary of value named '{}' is not cached: it depends on computed values", val_non_synth.GetName())
+        return summary
+    g_summary_cache.put(key, summary, stream.memo.regions, process)
+    return summary
+
+
+# One page of children with everything the IDE shows for them, to avoid a round trip per child
+def get_children_page(val: lldb.SBValue, start: int, count: int) -> dict:
+    synth_provider = _get_children_page_provider(val)
+    children = []
+    for index, child in enumerate(synth_provider.get_children_range(start, count), max(start, 0)):
+        if child is None:
+            continue
+        child_non_synth = child.GetNonSyntheticValue()
+        children.append({
+            'index': index,
+            'name': child_non_synth.GetName(),
+            'type': child_non_synth.GetDisplayTypeName(),
+            'summary': declarative_summary(child, None),
+            # natvis children are counted up to the first one, lists and trees are not walked
+            'has_children': DeclarativeSynthProvider(child, None).num_children_capped(0) > 0,
+        })
+
+    return {'num_children': synth_provider.num_children(), 'children': children}
+
+
+def _get_children_page_provider(val: lldb.SBValue) -> 'DeclarativeSynthProvider':
+    synth_provider = DeclarativeSynthProvider(val, None)
+    val_non_synth = synth_provider.val_non_synth
+    address = val_non_synth.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return synth_provider
+
+    process: lldb.SBProcess = val_non_synth.GetProcess()
+    format_spec = val_non_synth.GetFormat()
+    array_size = val_non_synth.GetFormatAsArraySize() if format_spec & eFormatAsArray else None
+    key = (process.GetUniqueID(), process.GetStopID(), address, val_non_synth.GetTypeName(), format_spec, array_size)
+    cached_provider = g_children_page_providers.get(key)
+    if cached_provider is not None:
+        g_children_page_providers.move_to_end(key)
+        return cached_provider
+
+    synth_provider.ensure_initialized()
+    if is_prefetching() and is_deadline_exceeded():
+        # children cut by the time budget of prefetching are not worth keeping
+        return synth_provider
+    g_children_page_providers[key] = synth_provider
+    while len(g_children_page_providers) > CHILDREN_PAGE_PROVIDERS_MAX_SIZE:
+        g_children_page_providers.popitem(last=False)
+    return synth_provider
+
+
 class DeclarativeSynthProvider(object):
     def __init__(self, val, internal_dict):
         update_value_dynamic_state(val)
@@ -257,30 +924,73 @@ class DeclarativeSynthProvider(object):
     def ensure_initialized(self):
         if self.children_provider:
             return
+        _update_target_modules(self.val_non_synth.GetTarget())
+        time_budget = get_expansion_time_budget()
+        if time_budget is None:
+            self.children_provider = self._prepare_children()
+            return
+
+        timed_out_key = _get_timed_out_key(self.val_non_synth)
+        children_provider = g_timed_out_children.get(timed_out_key) if timed_out_key is not None else None
+        if children_provider is not None:
+            self.children_provider = children_provider
+            return
+
+        prev_deadline = set_deadline(get_deadline_for_time_budget(time_budget))
+        try:
+            self.children_provider = self._prepare_children()
+            timed_out = is_deadline_exceeded()
+        finally:
+            set_deadline(prev_deadline)
+
+        if not timed_out:
+            return
+        self.children_provider = TruncatedChildrenProvider(self.val_non_synth, self.children_provider)
+        if timed_out_key is not None and not is_prefetching():
+            log("Children of value named '{}' have been truncated: time budget exceeded", self.val_non_synth.GetName())
+            g_timed_out_children[timed_out_key] = self.children_provider
+
+    def _prepare_children(self, children_limit=None) -> AbstractChildrenProvider:
+        children_provider = None
         try:
             log("Retrieving children of value named '{}'...", self.val_non_synth.GetName())
 
             format_spec = self.val_non_synth.GetFormat()
             use_raw_viz = format_spec & eFormatRawView
             provider = get_viz_descriptor_provider()
-            vis_descriptor = provider.get_matched_visualizers(self.val_non_synth.GetType(), use_raw_viz)
-            if vis_descriptor:
-                self.children_provider = vis_descriptor.prepare_children(self.val_non_synth)
+            vis_descriptor = provider.get_matched_visualizers(self.val_non_synth.GetType(), use_raw_viz,
+                                                              self.val_non_synth.GetTarget())
+            if vis_descriptor and children_limit is not None and isinstance(vis_descriptor, NatVisDescriptor):
+                children_provider = vis_descriptor.prepare_children(self.val_non_synth, children_limit)
+            elif vis_descriptor:
+                children_provider = vis_descriptor.prepare_children(self.val_non_synth)
 
         except IgnoreSynthProvider:
             pass
+        except RenderingTimeoutError:
+            # the raw layout would be taken for the children of the visualizer
+            log("Children of value named '{}' have not been retrieved: time budget exceeded",
+                self.val_non_synth.GetName())
+            return g_empty_children_provider
         except Exception as e:
             # some unexpected error happened
             if not g_force_suppress_errors:
                 log("{}", traceback.format_exc())
 
-        if not self.children_provider:
-            self.children_provider = StructChildrenProvider(self.val_non_synth)
+        if not children_provider:
+            children_provider = StructChildrenProvider(self.val_non_synth)
+        return children_provider
 
     def num_children(self):
         self.ensure_initialized()
         return self.children_provider.num_children()
 
+    def num_children_capped(self, limit):
+        # the count is exact up to the limit, anything above it only means there are more children
+        if self.children_provider:
+            return self.children_provider.num_children()
+        return self._prepare_children(limit + 1).num_children()
+
     def get_child_index(self, name):
         self.ensure_initialized()
         return self.children_provider.get_child_index(name)
@@ -289,65 +999,108 @@ class DeclarativeSynthProvider(object):
         self.ensure_initialized()
         return self.children_provider.get_child_at_index(index)
 
+    def get_children_range(self, start, count):
+        self.ensure_initialized()
+        return self.children_provider.get_children_range(start, count)
+
 
 class VizDescriptorProvider(AbstractVizDescriptorProvider):
     def __init__(self):
         self.type_to_visualizer_cache = {}
         self.type_to_raw_view_visualizer_cache = {}
 
-    def get_matched_visualizers(self, value_type: lldb.SBType, raw_visualizer: bool) -> AbstractVisDescriptor:
+    def get_matched_visualizers(self, value_type: lldb.SBType, raw_visualizer: bool,
+                                target: lldb.SBTarget) -> AbstractVisDescriptor:
+        type_name = value_type.GetName()
         if raw_visualizer:
             cache = self.type_to_raw_view_visualizer_cache
+            key = type_name
             use_natvis = False
         else:
+            # natvis visualizers inherited from base classes depend on the debug info of the target
             cache = self.type_to_visualizer_cache
+            key = (_get_target_key(target), type_name)
             use_natvis = True
 
-        type_name = value_type.GetName()
         try:
-            descriptor = cache[type_name]
+            descriptor = cache[key]
         except KeyError:
-            descriptor = _try_get_matched_visualizers(value_type, use_natvis)
-            cache[type_name] = descriptor
+            descriptor = _try_get_matched_visualizers(value_type, use_natvis, target)
+            cache[key] = descriptor
         return descriptor
 
+    def clear_cache(self):
+        self.type_to_visualizer_cache.clear()
+        self.type_to_raw_view_visualizer_cache.clear()
+        g_base_type_to_inherited_visualizer_cache.clear()
+
 
 def _get_matched_type_visualizers(type_name_template, only_inherited=False):
+    engine = get_type_matching_engine()
+    use_regex = engine != TypeMatchingEngine.STRUCTURAL
+    verify_regex = engine == TypeMatchingEngine.REGEX_VERIFIED
     result = []
-    if only_inherited:
-        for type_viz_storage in lldb_formatters_manager.get_all_type_viz():
-            result.extend(
-                [name_match_pair for name_match_pair in type_viz_storage.get_matched_types(type_name_template) if
-                 name_match_pair[0].is_inheritable])
-    else:
-        for type_viz_storage in lldb_formatters_manager.get_all_type_viz():
-            result.extend(
-                [name_match_pair for name_match_pair in type_viz_storage.get_matched_types(type_name_template)])
+    for type_viz_storage in lldb_formatters_manager.get_all_type_viz():
+        matched_types = type_viz_storage.get_matched_types(type_name_template, use_regex, verify_regex)
+        if only_inherited:
+            result.extend([name_match_pair for name_match_pair in matched_types if name_match_pair[0].is_inheritable])
+        else:
+            result.extend(matched_types)
     return result
 
 
-def _try_find_matched_natvis_visualizer_for_base(value_type: lldb.SBType) -> Optional[AbstractVisDescriptor]:
+# Inheritable natvis visualizer found in the hierarchy of a base type (or None if there is no one),
+# shared by all types derived from this base. By (target key, base type name)
+g_base_type_to_inherited_visualizer_cache = {}
+
+
+def _get_target_key(target: lldb.SBTarget):
+    return target.GetProcess().GetUniqueID()
+
+
+def _update_target_modules(target: lldb.SBTarget):
+    # a module loaded later may bring the base classes of the types found before
+    if update_failed_candidates_modules(target):
+        get_viz_descriptor_provider().clear_cache()
+
+
+def _try_find_matched_natvis_visualizer_for_base(value_type: lldb.SBType,
+                                                 target: lldb.SBTarget) -> Optional[AbstractVisDescriptor]:
     for index in range(value_type.GetNumberOfDirectBaseClasses()):
         base_type = value_type.GetDirectBaseClassAtIndex(index).GetType()
-        base_type_name = base_type.GetName()
-        try:
-            base_type_name_template = parse_type_name_template(base_type_name)
-        except Exception as e:
-            log('Parsing typename {} failed: {}', base_type_name, e)
-            raise
+        base_viz = _find_inherited_natvis_visualizer(base_type, target)
+        if base_viz is not None:
+            return base_viz
 
-        viz_candidates = _get_matched_type_visualizers(base_type_name_template, True)
-        if viz_candidates:
-            return NatVisDescriptor(viz_candidates, base_type_name_template)
+    return None
 
-        deep_base = _try_find_matched_natvis_visualizer_for_base(base_type)
-        if deep_base is not None:
-            return deep_base
 
-    return None
+def _find_inherited_natvis_visualizer(base_type: lldb.SBType, target: lldb.SBTarget) -> Optional[AbstractVisDescriptor]:
+    base_type_name = base_type.GetName()
+    key = (_get_target_key(target), base_type_name)
+    try:
+        return g_base_type_to_inherited_visualizer_cache[key]
+    except KeyError:
+        pass
+
+    try:
+        base_type_name_template = parse_type_name_template(base_type_name)
+    except Exception as e:
+        log('Parsing typename {} failed: {}', base_type_name, e)
+        raise
+
+    viz_candidates = _get_matched_type_visualizers(base_type_name_template, True)
+    if viz_candidates:
+        base_viz = NatVisDescriptor(viz_candidates, base_type_name_template)
+    else:
+        base_viz = _try_find_matched_natvis_visualizer_for_base(base_type, target)
+
+    g_base_type_to_inherited_visualizer_cache[key] = base_viz
+    return base_viz
 
 
-def _try_get_matched_visualizers(value_type: lldb.SBType, natvis_enabled) -> Optional[AbstractVisDescriptor]:
+def _try_get_matched_visualizers(value_type: lldb.SBType, natvis_enabled,
+                                 target: lldb.SBTarget) -> Optional[AbstractVisDescriptor]:
     value_type: lldb.SBType = value_type.GetUnqualifiedType()
     value_type_name = value_type.GetName()
 
@@ -361,12 +1114,13 @@ def _try_get_matched_visualizers(value_type: lldb.SBType, natvis_enabled) -> Opt
         viz_candidates = _get_matched_type_visualizers(type_name_template)
         if viz_candidates:
             log("Found natvis visualizer for type: '{}'", value_type_name)
+            try_offload_summary(value_type, viz_candidates[0][0])
             return NatVisDescriptor(viz_candidates, type_name_template)
 
-    return _try_get_matched_builtin_visualizer(value_type, natvis_enabled)
+    return _try_get_matched_builtin_visualizer(value_type, natvis_enabled, target)
 
 
-def _try_get_matched_builtin_visualizer(value_type, natvis_enabled):
+def _try_get_matched_builtin_visualizer(value_type, natvis_enabled, target):
     value_type_name = value_type.GetName()
     log("Trying to find builtin visualizer for type: '{}'", value_type_name)
 
@@ -376,7 +1130,7 @@ def _try_get_matched_builtin_visualizer(value_type, natvis_enabled):
         value_typedef_type_name = value_typedef_type.GetName()
         log("Type '{}' is typedef to type '{}'", value_type_name, value_typedef_type_name)
         if value_typedef_type_name != value_type_name:
-            return _try_get_matched_visualizers(value_typedef_type, natvis_enabled)
+            return _try_get_matched_visualizers(value_typedef_type, natvis_enabled, target)
 
     if type_class == lldb.eTypeClassBuiltin:
         char_presentation_info = CharVisDescriptor.char_types.get(value_type_name)
@@ -415,7 +1169,7 @@ def _try_get_matched_builtin_visualizer(value_type, natvis_enabled):
 
     if type_class == lldb.eTypeClassStruct or type_class == lldb.eTypeClassClass or type_class == lldb.eTypeClassUnion:
         if natvis_enabled:
-            natvis = _try_find_matched_natvis_visualizer_for_base(value_type)
+            natvis = _try_find_matched_natvis_visualizer_for_base(value_type, target)
             if natvis is not None:
                 return natvis
         lambda_name = _try_extract_lambda_type_name(value_type_name)
@@ -1,6 +1,12 @@
 from .jb_lldb_logging import log
 
 g_type_viz_loaders = {}
+# Loaders able to load several files at once, by the loader of a single file
+g_type_viz_bulk_loaders = {}
+# Loaders able to update a storage loaded before with the changes of its file, by the loader of a single file
+g_type_viz_incremental_loaders = {}
+# Functions expanding directories and glob patterns into files of the loader, by the loader of a single file
+g_type_viz_path_expanders = {}
 
 
 class TypeVizLoaderException(Exception):
@@ -25,3 +31,27 @@ def type_viz_loader_get_list():
 
 def type_viz_loader_get(tag):
     return g_type_viz_loaders[tag]
+
+
+def type_viz_bulk_loader_add(loader, bulk_loader):
+    g_type_viz_bulk_loaders[loader] = bulk_loader
+
+
+def type_viz_bulk_loader_get(loader):
+    return g_type_viz_bulk_loaders.get(loader)
+
+
+def type_viz_incremental_loader_add(loader, incremental_loader):
+    g_type_viz_incremental_loaders[loader] = incremental_loader
+
+
+def type_viz_incremental_loader_get(loader):
+    return g_type_viz_incremental_loaders.get(loader)
+
+
+def type_viz_path_expander_add(loader, path_expander):
+    g_type_viz_path_expanders[loader] = path_expander
+
+
+def type_viz_path_expander_get(loader):
+    return g_type_viz_path_expanders.get(loader)
@@ -1,3 +1,4 @@
+from .jb_lldb_declarative_formatters_loaders import type_viz_bulk_loader_get, type_viz_incremental_loader_get
 from .jb_lldb_logging import log
 
 
@@ -13,6 +14,8 @@ class FormattersManager(object):
         self.formatter_entries = {}
         self.summary_func_name = summary_func_name
         self.synthetic_provider_class_name = synthetic_provider_class_name
+        # pairs of (type name or regex, is regex) the summary and the synthetic provider are registered for
+        self.registered_type_matchers = []
 
     def get_all_registered_files(self):
         return self.formatter_entries.keys()
@@ -25,6 +28,11 @@ class FormattersManager(object):
         storage = loader(filepath)
         self.formatter_entries[filepath] = self.FormatterEntry(storage, loader)
 
+    def register_many(self, filepaths, loader, process_count):
+        for filepath, storage in zip(filepaths, self._load_many(filepaths, loader, process_count)):
+            log("Registering types storage for '{}'...", filepath)
+            self.formatter_entries[filepath] = self.FormatterEntry(storage, loader)
+
     def unregister(self, filepath):
         log("Unregistering types storage for '{}'...", filepath)
         try:
@@ -41,3 +49,60 @@ class FormattersManager(object):
             return
 
         entry.storage = entry.loader(filepath)
+
+    # Returns the changed types, or None if the whole file was loaded again
+    def update(self, filepath):
+        try:
+            entry = self.formatter_entries[filepath]
+        except KeyError:
+            log("Key '{}' wasn't found in formatters storage...", filepath)
+            return []
+
+        incremental_loader = type_viz_incremental_loader_get(entry.loader)
+        changed_types = incremental_loader(filepath, entry.storage) if incremental_loader else None
+        if changed_types is None:
+            entry.storage = entry.loader(filepath)
+        return changed_types
+
+    def reload_many(self, filepaths, process_count):
+        filepaths_by_loader = {}
+        for filepath in filepaths:
+            entry = self.formatter_entries.get(filepath)
+            if entry is None:
+                log("Key '{}' wasn't found in formatters storage...", filepath)
+                continue
+            filepaths_by_loader.setdefault(entry.loader, []).append(filepath)
+
+        for loader, loader_filepaths in filepaths_by_loader.items():
+            for filepath, storage in zip(loader_filepaths, self._load_many(loader_filepaths, loader, process_count)):
+                self.formatter_entries[filepath].storage = storage
+
+    @staticmethod
+    def _load_many(filepaths, loader, process_count):
+        bulk_loader = type_viz_bulk_loader_get(loader)
+        if bulk_loader is None or process_count <= 1:
+            # files are loaded while they are registered, a failed file keeps the files before it registered
+            return (loader(filepath) for filepath in filepaths)
+        return bulk_loader(filepaths, process_count)
+
+    def set_type_matchers(self, debugger, type_matchers):
+        new_type_matchers = set(type_matchers)
+        old_type_matchers = set(self.registered_type_matchers)
+        for type_matcher in self.registered_type_matchers:
+            if type_matcher not in new_type_matchers:
+                name, _ = type_matcher
+                log("Unregistering formatters for '{}'...", name)
+                debugger.HandleCommand('type summary delete --category jb_formatters "{}"'.format(name))
+                debugger.HandleCommand('type synthetic delete --category jb_formatters "{}"'.format(name))
+
+        for type_matcher in type_matchers:
+            if type_matcher not in old_type_matchers:
+                name, is_regex = type_matcher
+                log("Registering formatters for '{}'...", name)
+                regex_flag = is_regex and '-x ' or ''
+                debugger.HandleCommand('type summary add -v {}"{}" -F {} -e --category jb_formatters'.format(
+                    regex_flag, name, self.summary_func_name))
+                debugger.HandleCommand('type synthetic add {}"{}" -l {} --category jb_formatters'.format(
+                    regex_flag, name, self.synthetic_provider_class_name))
+
+        self.registered_type_matchers = list(type_matchers)
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 
 g_max_string_length = 250
 
@@ -12,6 +13,31 @@ g_enable_formatting = True
 g_global_hex = False
 g_global_hex_show_both = False
 
+g_targeted_registration = False
+
+g_summary_cache_enabled = False
+g_children_cache_enabled = False
+
+g_prefetch_enabled = False
+
+g_file_watching_enabled = False
+
+g_parse_process_count = 1
+
+# seconds, None if rendering has no time limit
+g_summary_time_budget = None
+g_expansion_time_budget = None
+
+
+class TypeMatchingEngine(Enum):
+    STRUCTURAL = 0
+    REGEX = 1
+    # regex matching checked against the structural one, mismatches are logged
+    REGEX_VERIFIED = 2
+
+
+g_type_matching_engine = TypeMatchingEngine.STRUCTURAL
+
 
 class DiagnosticsLevel(Enum):
     DISABLED = 0
@@ -81,3 +107,93 @@ def is_global_hex():
 def is_global_hex_show_both():
     global g_global_hex_show_both
     return g_global_hex_show_both
+
+
+def set_targeted_registration(val: bool):
+    global g_targeted_registration
+    g_targeted_registration = val
+
+
+def is_targeted_registration():
+    global g_targeted_registration
+    return g_targeted_registration
+
+
+def set_summary_cache_enabled(val: bool):
+    global g_summary_cache_enabled
+    g_summary_cache_enabled = val
+
+
+def is_summary_cache_enabled():
+    global g_summary_cache_enabled
+    return g_summary_cache_enabled
+
+
+def set_children_cache_enabled(val: bool):
+    global g_children_cache_enabled
+    g_children_cache_enabled = val
+
+
+def is_children_cache_enabled():
+    global g_children_cache_enabled
+    return g_children_cache_enabled
+
+
+def set_prefetch_enabled(val: bool):
+    global g_prefetch_enabled
+    g_prefetch_enabled = val
+
+
+def is_prefetch_enabled():
+    global g_prefetch_enabled
+    return g_prefetch_enabled
+
+
+def set_summary_time_budget(val: Optional[float]):
+    global g_summary_time_budget
+    g_summary_time_budget = val
+
+
+def get_summary_time_budget() -> Optional[float]:
+    global g_summary_time_budget
+    return g_summary_time_budget
+
+
+def set_expansion_time_budget(val: Optional[float]):
+    global g_expansion_time_budget
+    g_expansion_time_budget = val
+
+
+def get_expansion_time_budget() -> Optional[float]:
+    global g_expansion_time_budget
+    return g_expansion_time_budget
+
+
+def set_parse_process_count(val: int):
+    global g_parse_process_count
+    g_parse_process_count = val
+
+
+def get_parse_process_count() -> int:
+    global g_parse_process_count
+    return g_parse_process_count
+
+
+def set_type_matching_engine(val: TypeMatchingEngine):
+    global g_type_matching_engine
+    g_type_matching_engine = val
+
+
+def get_type_matching_engine() -> TypeMatchingEngine:
+    global g_type_matching_engine
+    return g_type_matching_engine
+
+
+def set_file_watching_enabled(val: bool):
+    global g_file_watching_enabled
+    g_file_watching_enabled = val
+
+
+def is_file_watching_enabled():
+    global g_file_watching_enabled
+    return g_file_watching_enabled
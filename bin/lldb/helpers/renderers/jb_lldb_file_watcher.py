@@ -0,0 +1,81 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from renderers.jb_lldb_logging import log
+
+# Registered files are polled by a background thread which only records changed files,
+# the files are loaded again by the debugger thread as renderers keep their state in module globals.
+
+POLL_INTERVAL = 1.0
+
+FileState = Optional[Tuple[int, int]]
+
+g_watcher_thread: Optional[threading.Thread] = None
+g_stop_event = threading.Event()
+g_lock = threading.Lock()
+g_file_states: Dict[str, FileState] = {}
+g_changed_files: Set[str] = set()
+
+
+def start_watching():
+    global g_watcher_thread
+    if g_watcher_thread is not None:
+        return
+    g_stop_event.clear()
+    g_watcher_thread = threading.Thread(target=_watch_files, name='jb_renderers_file_watcher', daemon=True)
+    g_watcher_thread.start()
+
+
+def stop_watching():
+    global g_watcher_thread
+    thread = g_watcher_thread
+    if thread is None:
+        return
+    g_stop_event.set()
+    thread.join()
+    g_watcher_thread = None
+    with g_lock:
+        g_file_states.clear()
+        g_changed_files.clear()
+
+
+def set_watched_files(filepaths: Iterable[str]):
+    # files are compared with their state at the moment they started to be watched
+    filepaths = set(filepaths)
+    with g_lock:
+        for filepath in list(g_file_states):
+            if filepath not in filepaths:
+                del g_file_states[filepath]
+                g_changed_files.discard(filepath)
+        for filepath in filepaths:
+            if filepath not in g_file_states:
+                g_file_states[filepath] = _get_file_state(filepath)
+
+
+def take_changed_files() -> List[str]:
+    with g_lock:
+        changed_files = sorted(g_changed_files)
+        g_changed_files.clear()
+    return changed_files
+
+
+def _watch_files():
+    while not g_stop_event.wait(POLL_INTERVAL):
+        with g_lock:
+            filepaths = list(g_file_states)
+        for filepath in filepaths:
+            state = _get_file_state(filepath)
+            with g_lock:
+                if filepath in g_file_states and g_file_states[filepath] != state:
+                    log("File '{}' has been changed", filepath)
+                    g_file_states[filepath] = state
+                    g_changed_files.add(filepath)
+
+
+def _get_file_state(filepath: str) -> FileState:
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
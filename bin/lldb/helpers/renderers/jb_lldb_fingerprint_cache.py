@@ -0,0 +1,87 @@
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import lldb
+
+from renderers.jb_lldb_logging import log
+
+# Entries which depend on too much memory are not worth re-reading it on every lookup
+MAX_FINGERPRINT_SIZE = 64 * 1024
+
+MemoryRegion = Tuple[int, int]
+
+
+# LRU cache of values computed from the debuggee memory. Every entry keeps a digest of the memory regions the value
+# was computed from and is reused only while the memory of these regions stays the same.
+class FingerprintCache(object):
+    def __init__(self, max_size: int, max_fingerprint_size: int = MAX_FINGERPRINT_SIZE):
+        self.max_size = max_size
+        self.max_fingerprint_size = max_fingerprint_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, process: lldb.SBProcess):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, regions, digest = entry
+        if compute_memory_digest(process, regions) != digest:
+            log("Cached value for '{}' is outdated", key)
+            del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, regions: List[MemoryRegion], process: lldb.SBProcess):
+        regions = merge_memory_regions(regions)
+        if sum(size for _, size in regions) > self.max_fingerprint_size:
+            return
+        digest = compute_memory_digest(process, regions)
+        if digest is None:
+            return
+
+        self.entries[key] = (value, regions, digest)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> str:
+        return '{} entries, {} hits, {} misses'.format(len(self.entries), self.hits, self.misses)
+
+
+def merge_memory_regions(regions: List[MemoryRegion]) -> List[MemoryRegion]:
+    # members and base classes are rendered inside their parents, read memory of every byte once
+    result = []
+    for address, size in sorted(regions):
+        if size <= 0:
+            continue
+        if result:
+            last_address, last_size = result[-1]
+            if address <= last_address + last_size:
+                result[-1] = (last_address, max(last_size, address + size - last_address))
+                continue
+        result.append((address, size))
+    return result
+
+
+def compute_memory_digest(process: lldb.SBProcess, regions: List[MemoryRegion]) -> Optional[bytes]:
+    digest = hashlib.blake2b(digest_size=16)
+    err = lldb.SBError()
+    for address, size in regions:
+        content = process.ReadMemory(address, size, err)
+        if err.Fail():
+            return None
+        digest.update(address.to_bytes(8, 'little'))
+        digest.update(size.to_bytes(8, 'little'))
+        digest.update(content)
+    return digest.digest()
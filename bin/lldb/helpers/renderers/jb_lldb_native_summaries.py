@@ -0,0 +1,162 @@
+import re
+from typing import Optional
+
+import lldb
+
+from jb_declarative_formatters import TypeViz
+from jb_declarative_formatters.type_viz_expression import TypeVizExpression
+
+from renderers.jb_lldb_builtin_formatters import NumberVisDescriptor
+from renderers.jb_lldb_declarative_formatters_options import is_global_hex, is_enabled_formatting
+from renderers.jb_lldb_logging import log
+
+# Display strings which are plain interpolation of member paths can be rendered by LLDB itself with summary strings,
+# so values of such types don't call into python for summaries at all.
+
+MEMBER_PATH_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(?:(?:\.|->)[A-Za-z_][A-Za-z0-9_]*)*$')
+MEMBER_PATH_STEP_REGEX = re.compile(r'(\.|->)?([A-Za-z_][A-Za-z0-9_]*)')
+
+# Summary strings are kept apart from the python formatters, so they never replace or delete each other
+NATIVE_SUMMARIES_CATEGORY = 'jb_native_summaries'
+
+g_native_summaries_enabled = False
+# summary string and count of evaluated expressions saved on every rendering, by type name
+g_native_summaries = {}
+# type names waiting for the registration, natvis matching has no access to the debugger
+g_pending_native_summaries = {}
+
+
+def set_native_summaries_enabled(val: bool):
+    global g_native_summaries_enabled
+    g_native_summaries_enabled = val
+
+
+def is_native_summaries_enabled():
+    global g_native_summaries_enabled
+    return g_native_summaries_enabled
+
+
+def translate_summary_to_summary_string(viz: TypeViz) -> Optional[str]:
+    if viz.include_view_id != 0 or viz.exclude_view_id != 0:
+        return None
+    if len(viz.summaries) != 1:
+        return None
+    condition = viz.summaries[0].condition
+    if condition and (condition.condition or condition.include_view_id != 0 or condition.exclude_view_id != 0):
+        return None
+
+    result = []
+    for (s, expr) in viz.summaries[0].value.parts_list:
+        result.append(_escape_summary_string_text(s))
+        if expr is not None:
+            if not _is_plain_member_path(expr):
+                return None
+            result.append('${var.' + expr.text.strip() + '}')
+    return ''.join(result)
+
+
+def try_offload_summary(value_type: lldb.SBType, viz: TypeViz):
+    # summary strings produce neither hex numbers nor the markup of the IDE
+    if not g_native_summaries_enabled or is_global_hex() or is_enabled_formatting():
+        return
+
+    type_name = value_type.GetName()
+    if type_name in g_native_summaries or type_name in g_pending_native_summaries:
+        return
+
+    summary_string = translate_summary_to_summary_string(viz)
+    if summary_string is None:
+        return
+
+    # only numbers are presented by LLDB exactly the same way we do
+    expressions = [expr for _, expr in viz.summaries[0].value.parts_list if expr is not None]
+    for expr in expressions:
+        member_type = _find_member_path_type(value_type, expr.text.strip())
+        if member_type is None or member_type.GetName() not in NumberVisDescriptor.numeric_types:
+            return
+
+    log("Display string of type '{}' is offloaded to summary string '{}'", type_name, summary_string)
+    g_pending_native_summaries[type_name] = (summary_string, len(expressions))
+
+
+def register_pending_native_summaries(debugger: lldb.SBDebugger):
+    if not g_pending_native_summaries:
+        return
+
+    category: lldb.SBTypeCategory = _get_native_summaries_category(debugger)
+    for type_name, (summary_string, expressions_count) in g_pending_native_summaries.items():
+        summary = lldb.SBTypeSummary.CreateWithSummaryString(summary_string,
+                                                             lldb.eTypeOptionCascade | lldb.eTypeOptionHideValue)
+        if category.AddTypeSummary(lldb.SBTypeNameSpecifier(type_name, False), summary):
+            g_native_summaries[type_name] = (summary_string, expressions_count)
+        else:
+            log("Registering summary string for type '{}' failed", type_name)
+    g_pending_native_summaries.clear()
+
+
+def unregister_native_summaries(debugger: lldb.SBDebugger):
+    g_pending_native_summaries.clear()
+    if not g_native_summaries:
+        return
+
+    category: lldb.SBTypeCategory = _get_native_summaries_category(debugger)
+    for type_name in g_native_summaries:
+        category.DeleteTypeSummary(lldb.SBTypeNameSpecifier(type_name, False))
+    g_native_summaries.clear()
+
+
+def get_native_summaries_report() -> str:
+    lines = ['{} type(s) offloaded to native summary strings'.format(len(g_native_summaries))]
+    for type_name, (summary_string, expressions_count) in sorted(g_native_summaries.items()):
+        lines.append("'{}': '{}' ({} expression evaluation(s) saved per summary)".format(type_name, summary_string,
+                                                                                       expressions_count))
+    return '\n'.join(lines)
+
+
+def _get_native_summaries_category(debugger: lldb.SBDebugger) -> lldb.SBTypeCategory:
+    category: lldb.SBTypeCategory = debugger.GetCategory(NATIVE_SUMMARIES_CATEGORY)
+    if not category.IsValid():
+        # the category has to be enabled after jb_formatters to take precedence over it
+        category = debugger.CreateCategory(NATIVE_SUMMARIES_CATEGORY)
+        category.SetEnabled(True)
+    return category
+
+
+def _is_plain_member_path(expr: TypeVizExpression) -> bool:
+    opts = expr.view_options
+    if opts.array_size is not None or opts.format_spec or opts.format_flags or opts.view_spec:
+        return False
+    return MEMBER_PATH_REGEX.match(expr.text.strip()) is not None
+
+
+def _escape_summary_string_text(text: str) -> str:
+    return re.sub(r'([\\${}])', r'\\\1', text)
+
+
+def _find_member_path_type(value_type: lldb.SBType, path: str) -> Optional[lldb.SBType]:
+    cur_type: lldb.SBType = value_type.GetCanonicalType()
+    for match in MEMBER_PATH_STEP_REGEX.finditer(path):
+        separator, name = match.groups()
+        if separator == '->':
+            if cur_type.GetTypeClass() != lldb.eTypeClassPointer:
+                return None
+            cur_type = cur_type.GetPointeeType().GetCanonicalType()
+        cur_type = _find_member_type(cur_type, name)
+        if cur_type is None:
+            return None
+        cur_type = cur_type.GetCanonicalType()
+    return cur_type
+
+
+def _find_member_type(value_type: lldb.SBType, name: str) -> Optional[lldb.SBType]:
+    if value_type.GetTypeClass() not in {lldb.eTypeClassStruct, lldb.eTypeClassClass, lldb.eTypeClassUnion}:
+        return None
+    for index in range(value_type.GetNumberOfFields()):
+        field: lldb.SBTypeMember = value_type.GetFieldAtIndex(index)
+        if field.GetName() == name:
+            return field.GetType()
+    for index in range(value_type.GetNumberOfDirectBaseClasses()):
+        member_type = _find_member_type(value_type.GetDirectBaseClassAtIndex(index).GetType().GetCanonicalType(), name)
+        if member_type is not None:
+            return member_type
+    return None
@@ -14,6 +14,38 @@ from renderers.jb_lldb_declarative_formatters_options import *
 from renderers.jb_lldb_format_specs import *
 from renderers.jb_lldb_utils import *
 from renderers.jb_lldb_format import overlay_child_format, update_value_dynamic_state, overlay_summary_format
+from renderers.jb_lldb_fingerprint_cache import FingerprintCache
+
+
+# Summary candidates which failed to compile for a concrete type independently of the value being rendered
+g_failed_summary_candidates = set()
+# Incremented on every check whose result depends on the value (conditions, views)
+g_value_dependent_checks = 0
+
+# Default summaries show three children, one more tells whether the ellipsis is needed
+SUMMARY_CHILDREN_LIMIT = 4
+
+
+# Process and number of its modules the failures were recorded with. A library loaded later may declare
+# the types and members the failed expressions need.
+g_failed_candidates_modules = None
+
+
+def clear_failed_candidates_cache():
+    g_failed_summary_candidates.clear()
+    clear_expression_parse_errors_cache()
+
+
+def update_failed_candidates_modules(target: lldb.SBTarget) -> bool:
+    global g_failed_candidates_modules
+    modules = (target.GetProcess().GetUniqueID(), target.GetNumModules())
+    if modules == g_failed_candidates_modules:
+        return False
+    if g_failed_candidates_modules is not None:
+        log("Modules of the target have changed, expressions which failed to compile will be tried again")
+    clear_failed_candidates_cache()
+    g_failed_candidates_modules = modules
+    return True
 
 
 class NatVisDescriptor(AbstractVisDescriptor):
@@ -23,8 +55,12 @@ class NatVisDescriptor(AbstractVisDescriptor):
                                viz, viz_name in candidates]
 
     def output_summary(self, value_non_synth: lldb.SBValue, stream: Stream):
+        global g_value_dependent_checks
+        value_type_name = value_non_synth.GetTypeName()
         for name_viz_pair in self.viz_candidates:
             viz, type_viz_name, matches = name_viz_pair
+            failed_candidate_key = (viz, type_viz_name, value_type_name)
+            checks_before = g_value_dependent_checks
             try:
                 log("Trying visualizer for type '{}'...", str(type_viz_name))
                 if not _check_include_exclude_view_condition(viz, value_non_synth):
@@ -34,12 +70,23 @@ class NatVisDescriptor(AbstractVisDescriptor):
                     log('No user provided summary found, return default...')
                     return self.output_summary_from_children(value_non_synth, stream)
 
+                if failed_candidate_key in g_failed_summary_candidates:
+                    log("Visualizer for type '{}' is known to fail for '{}', skipped", str(type_viz_name),
+                        value_type_name)
+                    continue
+
                 # try to choose candidate from ordered display string expressions
                 success = _find_first_good_node(_process_summary_node, viz.summaries, value_non_synth,
                                                 matches, stream)
                 if success is not None:
                     return
 
+            except EvaluateParseError:
+                # failure didn't depend on the value itself, so it will be the same for every value of this type
+                if checks_before == g_value_dependent_checks:
+                    g_failed_summary_candidates.add(failed_candidate_key)
+                continue
+
             except EvaluateError:
                 continue
 
@@ -47,7 +94,7 @@ class NatVisDescriptor(AbstractVisDescriptor):
         return self.output_summary_from_children(value_non_synth, stream)
 
     def output_summary_from_children(self, value_non_synth, stream):
-        children_provider = self.prepare_children(value_non_synth)
+        children_provider = self.prepare_children(value_non_synth, SUMMARY_CHILDREN_LIMIT)
         num_children = children_provider.num_children()
 
         stream.output("{")
@@ -79,7 +126,7 @@ class NatVisDescriptor(AbstractVisDescriptor):
 
         stream.output("}")
 
-    def prepare_children(self, value_non_synth: lldb.SBValue):
+    def prepare_children(self, value_non_synth: lldb.SBValue, children_limit=None):
         value_name = value_non_synth.GetName()
         value_type_name = value_non_synth.GetType().GetName()
         log("Initial retrieving children of value named '{}' of type '{}'...", value_name, value_type_name)
@@ -102,7 +149,8 @@ class NatVisDescriptor(AbstractVisDescriptor):
                         try:
                             set_recursion_level(level + 1)
                             providers, start_indexes = _try_update_child_providers(value_non_synth, viz, type_viz_name,
-                                                                                   self.type_name_template)
+                                                                                   self.type_name_template,
+                                                                                   children_limit)
                         finally:
                             set_recursion_level(level)
 
@@ -173,6 +221,35 @@ class NatVisChildrenProvider(AbstractChildrenProvider):
                 raise
             return None
 
+    def get_children_range(self, start, count):
+        children = []
+        if not self.child_providers:
+            return children
+
+        end = start + count
+        for prov, prov_start in zip(self.child_providers, self.child_providers_start_indexes):
+            if prov_start >= end:
+                break
+            prov_end = prov_start + prov.num_children()
+            if prov_end <= start:
+                continue
+            range_start = max(start, prov_start)
+            try:
+                prov_children = prov.get_children_range(range_start - prov_start, min(end, prov_end) - range_start)
+            except Exception as e:
+                # some unexpected error happened
+                if not g_force_suppress_errors:
+                    raise
+                break
+
+            for child in prov_children:
+                if child is not None:
+                    # apply inheritable formatting from parent value
+                    overlay_child_format(child, self.format_spec)
+                children.append(child)
+
+        return children
+
     def _find_child_provider(self, index):
         # TODO: binary search, not linear
         for i, start_idx in enumerate(self.child_providers_start_indexes):
@@ -223,19 +300,25 @@ def _evaluate_interpolated_string_to_stream(stream: Stream,
                                             ctx_val: lldb.SBValue,
                                             wildcards=None,
                                             context=None):
-    max_stream_length = get_max_string_length()
-
     nested_stream = stream.create_nested()
-    for (s, expr) in interp_string.parts_list:
-        if nested_stream.length > max_stream_length:
-            break
-        nested_stream.output(s)
-        if expr is not None:
-            if nested_stream.length > max_stream_length:
-                break
-            _eval_display_string_expression(nested_stream, ctx_val, expr, wildcards, context)
-
-    stream.output(str(nested_stream))
+    # expressions evaluated with a context are executed in the code of CustomListItems, they can't be batched
+    expressions = [_resolve_wildcards(expr.text, wildcards) if wildcards else expr.text
+                   for (_, expr) in interp_string.parts_list if expr is not None] if context is None else []
+    try:
+        with batched_expressions(ctx_val, expressions):
+            for (s, expr) in interp_string.parts_list:
+                if nested_stream.budget.is_exhausted():
+                    break
+                nested_stream.output(s)
+                if expr is not None:
+                    if nested_stream.budget.is_exhausted():
+                        break
+                    _eval_display_string_expression(nested_stream, ctx_val, expr, wildcards, context)
+    except:
+        stream.discard_nested(nested_stream)
+        raise
+
+    stream.output_nested(nested_stream)
     return True
 
 
@@ -283,11 +366,11 @@ def _fix_wildcard_matches(matches):
     return [_remove_type_prefix(str(t)) for t in matches]
 
 
-def _try_update_child_providers(valobj_non_synth, viz, type_viz_name, type_name_template):
+def _try_update_child_providers(valobj_non_synth, viz, type_viz_name, type_name_template, children_limit=None):
     log("Trying visualizer for type '{}'...", str(type_viz_name))
     wildcard_matches = _match_type_viz_template(type_viz_name.type_name_template, type_name_template)
-    child_providers = _build_child_providers(viz.item_providers, valobj_non_synth,
-                                             wildcard_matches) if viz.item_providers is not None else None
+    child_providers = _build_child_providers(viz.item_providers, valobj_non_synth, wildcard_matches,
+                                             children_limit) if viz.item_providers is not None else None
     child_providers_start_indexes = None
 
     if child_providers:
@@ -301,6 +384,8 @@ def _try_update_child_providers(valobj_non_synth, viz, type_viz_name, type_name_
 
 
 def _check_condition(val, condition, context=None):
+    global g_value_dependent_checks
+    g_value_dependent_checks += 1
     res = eval_expression(val, '(bool)(' + condition + ')', None, context)
     if not res.GetValueAsUnsigned():
         return False
@@ -414,7 +499,57 @@ def _eval_display_string_expression(stream: Stream, ctx, expr, wildcards, contex
     stream.output_object(result_non_synth)
 
 
+# Results of conditions of candidate nodes computed by one selector expression,
+# by (condition, load address and type name of the context value). Equal conditions of different types are shared.
+g_selected_conditions = {}
+
+
+def _select_first_true_condition(nodes, ctx_val: lldb.SBValue, wildcards):
+    global g_value_dependent_checks
+    address = ctx_val.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return []
+    type_name = ctx_val.GetTypeName()
+
+    # candidates excluded by views are skipped without evaluation, the chain ends with an unconditional candidate
+    chain = []
+    for node in nodes:
+        condition: TypeVizCondition = node.condition
+        if condition.include_view_id != 0 and get_custom_view_id(ctx_val.GetFormat()) != condition.include_view_id:
+            continue
+        if condition.exclude_view_id != 0 and get_custom_view_id(ctx_val.GetFormat()) == condition.exclude_view_id:
+            continue
+        if not condition.condition:
+            break
+        chain.append((condition, _resolve_wildcards(condition.condition, wildcards)))
+    if len(chain) < 2:
+        return []
+
+    selector = ''.join('(bool)({}) ? {} : '.format(text, index) for index, (_, text) in enumerate(chain)) + '-1'
+    g_value_dependent_checks += 1
+    try:
+        result = eval_expression(ctx_val, selector, None)
+    except EvaluateError:
+        # the conditions are evaluated one by one to report the failed one the same way as before
+        return []
+    if result.GetNonSyntheticValue().GetError().Fail():
+        return []
+
+    selected_index = result.GetValueAsSigned()
+    keys = []
+    for index, (condition, _) in enumerate(chain):
+        if 0 <= selected_index < index:
+            break
+        key = (condition, address, type_name)
+        g_selected_conditions[key] = index == selected_index
+        keys.append(key)
+    return keys
+
+
 def _process_node_condition(condition: TypeVizCondition, ctx_val, wildcards, index_str=None) -> bool:
+    global g_value_dependent_checks
+    if condition.include_view_id != 0 or condition.exclude_view_id != 0:
+        g_value_dependent_checks += 1
     if condition.include_view_id != 0:
         if get_custom_view_id(ctx_val.GetFormat()) != condition.include_view_id:
             return False
@@ -422,6 +557,12 @@ def _process_node_condition(condition: TypeVizCondition, ctx_val, wildcards, ind
         if get_custom_view_id(ctx_val.GetFormat()) == condition.exclude_view_id:
             return False
     if condition.condition:
+        if g_selected_conditions and not index_str:
+            selected = g_selected_conditions.get((condition, ctx_val.GetLoadAddress(), ctx_val.GetTypeName()))
+            if selected is not None:
+                g_value_dependent_checks += 1
+                return selected
+
         processed_condition = _resolve_wildcards(condition.condition, wildcards)
         if index_str:
             processed_condition = processed_condition.replace('$i', index_str)
@@ -500,7 +641,7 @@ class RawViewItemProvider(AbstractChildrenProvider):
         return self.value
 
 
-def _process_item_provider_single(item_provider, val, wildcards):
+def _process_item_provider_single(item_provider, val, wildcards, children_limit):
     item_value = _node_processor_display_value(item_provider, val, wildcards)
     if not item_value:
         return None
@@ -527,19 +668,24 @@ class ExpandedItemProvider(AbstractChildrenProvider):
         return result if result.GetNonSyntheticValue().GetName() != RAW_VIEW_ITEM_NAME else None
 
 
-def _process_item_provider_expanded(item_provider, val, wildcards):
+def _process_item_provider_expanded(item_provider, val, wildcards, children_limit):
     item_value: lldb.SBValue = _node_processor_display_value(item_provider, val, wildcards)
     if not item_value:
         return None
     return ExpandedItemProvider(item_value)
 
 
-def _find_first_good_node(node_proc, nodes, *args, **kwargs):
-    for node in nodes:
-        item_value = node_proc(node, *args, **kwargs)
-        if item_value is not None:
-            return item_value
-    return None
+def _find_first_good_node(node_proc, nodes, ctx_val, wildcards, *args, **kwargs):
+    selected_keys = _select_first_true_condition(nodes, ctx_val, wildcards)
+    try:
+        for node in nodes:
+            item_value = node_proc(node, ctx_val, wildcards, *args, **kwargs)
+            if item_value is not None:
+                return item_value
+        return None
+    finally:
+        for key in selected_keys:
+            g_selected_conditions.pop(key, None)
 
 
 @optional_node_processor
@@ -578,6 +724,9 @@ def _node_processor_array_items_value_pointer(value_pointer_node, ctx_val, wildc
     return value
 
 
+# Ranges of children are served by the per index loop of AbstractChildrenProvider: children are made at offsets
+# without evaluation, neighbouring ones are read from the same lines of the memory cache of LLDB. A single read
+# of the range wouldn't help, LLDB doesn't cache reads longer than a line
 class ArrayItemsProvider(AbstractChildrenProvider):
     def __init__(self, size, value_pointer, elem_type):
         self.size = size
@@ -607,16 +756,22 @@ def _node_processor_array_items(array_items_node, ctx_val, wildcards):
         if not _process_node_condition(array_items_node.condition, ctx_val, wildcards):
             return None
 
-    size = _find_first_good_node(_node_processor_size, array_items_node.size_nodes, ctx_val, wildcards)
-    # ???
-    if size is None:
-        raise EvaluateError('No valid Size node found')
+    # candidates with conditions are likely to be invalid when their conditions are false
+    expressions = [_resolve_wildcards(node.text, wildcards) for node in array_items_node.size_nodes
+                   if not node.condition.condition]
+    expressions += [_resolve_wildcards(node.expr.text, wildcards) for node in array_items_node.value_pointer_nodes
+                    if not node.condition.condition]
+    with batched_expressions(ctx_val, expressions):
+        size = _find_first_good_node(_node_processor_size, array_items_node.size_nodes, ctx_val, wildcards)
+        # ???
+        if size is None:
+            raise EvaluateError('No valid Size node found')
 
-    value_pointer_value = _find_first_good_node(_node_processor_array_items_value_pointer,
-                                                array_items_node.value_pointer_nodes, ctx_val, wildcards)
-    # ???
-    if value_pointer_value is None:
-        raise EvaluateError('No valid ValuePointerType node found')
+        value_pointer_value = _find_first_good_node(_node_processor_array_items_value_pointer,
+                                                    array_items_node.value_pointer_nodes, ctx_val, wildcards)
+        # ???
+        if value_pointer_value is None:
+            raise EvaluateError('No valid ValuePointerType node found')
 
     value_pointer_type = value_pointer_value.GetNonSyntheticValue().GetType()
     if value_pointer_type.IsPointerType():
@@ -630,7 +785,7 @@ def _node_processor_array_items(array_items_node, ctx_val, wildcards):
     return ArrayItemsProvider(size, value_pointer_value, elem_type)
 
 
-def _process_item_provider_array_items(item_provider, val, wildcards):
+def _process_item_provider_array_items(item_provider, val, wildcards, children_limit):
     return _node_processor_array_items(item_provider, val, wildcards)
 
 
@@ -653,6 +808,8 @@ def _node_processor_index_list_items_value_node(idx_str, name, index_list_value_
     return value
 
 
+# Ranges of children are served by the per index loop of AbstractChildrenProvider: $i is substituted into
+# the text of ValueNode expressions and their conditions, so every index is a separate evaluation
 class IndexListItemsProvider(AbstractChildrenProvider):
     def __init__(self, size, index_list_node, ctx_val, wildcards):
         self.size = size
@@ -697,7 +854,7 @@ def _node_processor_index_list_items(index_list_node, ctx_val, wildcards):
     return IndexListItemsProvider(size, index_list_node, ctx_val, wildcards)
 
 
-def _process_item_provider_index_list_items(item_provider, val, wildcards):
+def _process_item_provider_index_list_items(item_provider, val, wildcards, children_limit):
     return _node_processor_index_list_items(item_provider, val, wildcards)
 
 
@@ -716,12 +873,102 @@ def _get_ptr_value(node):
     return val.GetValueAsUnsigned() if _is_valid_node_ptr(val) else 0
 
 
+def _get_max_children_count(size, children_limit):
+    max_size = size if size is not None else g_max_num_children
+    if children_limit is not None:
+        max_size = min(max_size, children_limit)
+    return max_size
+
+
 class NodesProvider(object):
     def __init__(self):
         self.cache = []
         self.has_more = False
         self.names = None
         self.name2index = None
+        # nodes walk has been stopped by the time budget
+        self.timed_out = False
+
+
+CHILDREN_CACHE_MAX_SIZE = 1024
+CHILDREN_CACHE_MAX_FINGERPRINT_SIZE = 1024 * 1024
+# Nodes of lists and trees and items of custom lists kept between stops while memory of the container
+# and the nodes (items) is unchanged, only addresses are kept to read actual values on every stop
+g_children_cache = FingerprintCache(CHILDREN_CACHE_MAX_SIZE, CHILDREN_CACHE_MAX_FINGERPRINT_SIZE)
+
+
+def clear_children_cache():
+    g_children_cache.clear()
+
+
+def _get_children_cache_key(item_provider_node, ctx_val: lldb.SBValue, wildcards, *evaluated_values):
+    if not is_children_cache_enabled():
+        return None
+    address = ctx_val.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return None
+    return (ctx_val.GetProcess().GetUniqueID(), address, ctx_val.GetTypeName(), item_provider_node,
+            tuple(wildcards) if wildcards else None) + evaluated_values
+
+
+def _create_value_from_address(target: lldb.SBTarget, name, address: int, value_type: lldb.SBType):
+    return target.CreateValueFromAddress(name, lldb.SBAddress(address, target), value_type)
+
+
+class NodeValuesFromAddresses(object):
+    def __init__(self, target: lldb.SBTarget, node_type: lldb.SBType, node_addresses):
+        self.target = target
+        self.node_type = node_type
+        self.node_addresses = node_addresses
+
+    def __len__(self):
+        return len(self.node_addresses)
+
+    def __getitem__(self, index):
+        address = self.node_addresses[index]
+        if address is None:
+            return None
+        return _create_value_from_address(self.target, '', address, self.node_type)
+
+
+class CachedNodesProvider(NodesProvider):
+    def __init__(self, target: lldb.SBTarget, node_type: lldb.SBType, node_addresses, has_more, names, name2index):
+        super(CachedNodesProvider, self).__init__()
+        self.cache = NodeValuesFromAddresses(target, node_type, node_addresses)
+        self.has_more = has_more
+        self.names = names
+        self.name2index = name2index
+
+
+def _get_nodes_from_children_cache(key, ctx_val: lldb.SBValue) -> Optional[NodesProvider]:
+    if key is None:
+        return None
+    entry = g_children_cache.get(key, ctx_val.GetProcess())
+    if entry is None:
+        return None
+    node_type, node_addresses, has_more, names, name2index = entry
+    return CachedNodesProvider(ctx_val.GetTarget(), node_type, node_addresses, has_more, names, name2index)
+
+
+def _put_nodes_to_children_cache(key, ctx_val: lldb.SBValue, nodes_provider: NodesProvider):
+    if key is None:
+        return
+    node_type = None
+    node_addresses = []
+    regions = [(ctx_val.GetLoadAddress(), ctx_val.GetByteSize())]
+    for node in nodes_provider.cache:
+        if node is None:
+            node_addresses.append(None)
+            continue
+        address = node.GetLoadAddress()
+        if address == lldb.LLDB_INVALID_ADDRESS:
+            return
+        node_type = node.GetType()
+        node_addresses.append(address)
+        regions.append((address, node.GetByteSize()))
+
+    entry = (node_type, node_addresses, nodes_provider.has_more, nodes_provider.names, nodes_provider.name2index)
+    g_children_cache.put(key, entry, regions, ctx_val.GetProcess())
 
 
 class CustomItemsProvider(AbstractChildrenProvider):
@@ -797,7 +1044,7 @@ class LinkedListIterator(object):
 
 
 class LinkedListIndexedNodesProvider(NodesProvider):
-    def __init__(self, size, head_pointer, next_expression):
+    def __init__(self, size, head_pointer, next_expression, children_limit):
         super(LinkedListIndexedNodesProvider, self).__init__()
 
         it = LinkedListIterator(head_pointer, next_expression)
@@ -807,23 +1054,29 @@ class LinkedListIndexedNodesProvider(NodesProvider):
 
         # iterate all list nodes and cache them
         start = _get_ptr_value(it.node_value)
-        max_size = size if size is not None else g_max_num_children
+        max_size = _get_max_children_count(size, children_limit)
         idx = 0
-        while it and idx < max_size:
-            cache.append(it.cur_value())
-            idx += 1
-            it.move_to_next()
+        try:
+            while it and idx < max_size:
+                cache.append(it.cur_value())
+                idx += 1
+                it.move_to_next()
 
-            if it and _get_ptr_value(it.node_value) == start:
-                # check for cycled
-                break
+                if it and _get_ptr_value(it.node_value) == start:
+                    # check for cycled
+                    break
+        except RenderingTimeoutError:
+            log("Linked list walk has been stopped after {} nodes: time budget exceeded", idx)
+            self.timed_out = True
 
-        if size is None:
+        if self.timed_out:
+            has_more = True
+        elif size is None:
             if it and idx >= max_size:
                 has_more = True
         else:
-            if idx < size:
-                cache.extend([None] * (size - idx))
+            if idx < max_size:
+                cache.extend([None] * (max_size - idx))
 
         self.cache = cache
         self.has_more = has_more
@@ -832,7 +1085,7 @@ class LinkedListIndexedNodesProvider(NodesProvider):
 
 
 class LinkedListCustomNameNodesProvider(NodesProvider):
-    def __init__(self, size, head_pointer, next_expression, custom_value_name, wildcards):
+    def __init__(self, size, head_pointer, next_expression, custom_value_name, wildcards, children_limit):
         super(LinkedListCustomNameNodesProvider, self).__init__()
 
         it = LinkedListIterator(head_pointer, next_expression)
@@ -843,29 +1096,35 @@ class LinkedListCustomNameNodesProvider(NodesProvider):
         name2index = {}
 
         # iterate all list nodes and cache them
-        max_size = size if size is not None else g_max_num_children
+        max_size = _get_max_children_count(size, children_limit)
         idx = 0
         start = _get_ptr_value(it.node_value)
-        while it and idx < max_size:
-            cur_val = it.cur_value()
-            name = _evaluate_interpolated_string(custom_value_name, cur_val, wildcards)
-            names.append(name)
-            name2index[name] = idx
-
-            cache.append(cur_val)
-            idx += 1
-            it.move_to_next()
-
-            if it and _get_ptr_value(it.node_value) == start:
-                # check for cycled
-                break
+        try:
+            while it and idx < max_size:
+                cur_val = it.cur_value()
+                name = _evaluate_interpolated_string(custom_value_name, cur_val, wildcards)
+                names.append(name)
+                name2index[name] = idx
+
+                cache.append(cur_val)
+                idx += 1
+                it.move_to_next()
+
+                if it and _get_ptr_value(it.node_value) == start:
+                    # check for cycled
+                    break
+        except RenderingTimeoutError:
+            log("Linked list walk has been stopped after {} nodes: time budget exceeded", idx)
+            self.timed_out = True
 
-        if size is None:
+        if self.timed_out:
+            has_more = True
+        elif size is None:
             if it and idx >= max_size:
                 has_more = True
         else:
-            if idx < size:
-                cache.extend([None] * (size - idx))
+            if idx < max_size:
+                cache.extend([None] * (max_size - idx))
 
         self.cache = cache
         self.has_more = has_more
@@ -880,7 +1139,7 @@ def _node_processor_linked_list_items_head_pointer(head_pointer_node, ctx_val, w
 
 
 @optional_node_processor
-def _node_processor_linked_list_items(linked_list_node, ctx_val, wildcards):
+def _node_processor_linked_list_items(linked_list_node, ctx_val, wildcards, children_limit):
     assert isinstance(linked_list_node, TypeVizItemProviderLinkedListItems)
     if linked_list_node.condition:
         if not _process_node_condition(linked_list_node.condition, ctx_val, wildcards):
@@ -901,28 +1160,34 @@ def _node_processor_linked_list_items(linked_list_node, ctx_val, wildcards):
     value_expression = _resolve_wildcards(value_node.expr.text, wildcards)
     value_opts = value_node.expr.view_options
 
-    if value_node.name is None:
-        nodes_provider = LinkedListIndexedNodesProvider(size, head_pointer_value, next_pointer_expression)
-    else:
-        nodes_provider = LinkedListCustomNameNodesProvider(size, head_pointer_value, next_pointer_expression,
-                                                           value_node.name, wildcards)
+    cache_key = _get_children_cache_key(linked_list_node, ctx_val, wildcards, size, _get_ptr_value(head_pointer_value))
+    nodes_provider = _get_nodes_from_children_cache(cache_key, ctx_val)
+    if nodes_provider is None:
+        if value_node.name is None:
+            nodes_provider = LinkedListIndexedNodesProvider(size, head_pointer_value, next_pointer_expression,
+                                                            children_limit)
+        else:
+            nodes_provider = LinkedListCustomNameNodesProvider(size, head_pointer_value, next_pointer_expression,
+                                                               value_node.name, wildcards, children_limit)
+        if children_limit is None and not nodes_provider.timed_out:
+            _put_nodes_to_children_cache(cache_key, ctx_val, nodes_provider)
 
     return CustomItemsProvider(nodes_provider, value_expression, value_opts, wildcards)
 
 
-def _process_item_provider_linked_list_items(item_provider, val, wildcards):
-    return _node_processor_linked_list_items(item_provider, val, wildcards)
+def _process_item_provider_linked_list_items(item_provider, val, wildcards, children_limit):
+    return _node_processor_linked_list_items(item_provider, val, wildcards, children_limit)
 
 
 class BinaryTreeIndexedNodesProvider(NodesProvider):
-    def __init__(self, size, head_pointer, left_expression, right_expression, node_condition):
+    def __init__(self, size, head_pointer, left_expression, right_expression, node_condition, children_limit):
         super(BinaryTreeIndexedNodesProvider, self).__init__()
 
         cache = []
         has_more = False
 
         # iterate all list nodes and cache them
-        max_size = size if size is not None else g_max_num_children
+        max_size = _get_max_children_count(size, children_limit)
         idx = 0
         cur = head_pointer
         stack = []  # parents
@@ -932,26 +1197,32 @@ class BinaryTreeIndexedNodesProvider(NodesProvider):
                 return True
             return _check_condition(node.GetNonSyntheticValue().Dereference(), node_condition)
 
-        while (_get_ptr_value(cur) != 0 and check_condition(cur) or stack) and idx < max_size:
-            while _get_ptr_value(cur) != 0 and check_condition(cur):
-                if len(stack) > 100:  # ~2^100 nodes can't be true - something went wrong
-                    raise Exception("Invalid tree")
-
-                stack.append(cur)
-                cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), left_expression, None)
-
-            cur = stack.pop()
-            cache.append(cur.GetNonSyntheticValue().Dereference())
-            idx += 1
-
-            cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), right_expression, None)
-
-        if size is None:
+        try:
+            while (_get_ptr_value(cur) != 0 and check_condition(cur) or stack) and idx < max_size:
+                while _get_ptr_value(cur) != 0 and check_condition(cur):
+                    if len(stack) > 100:  # ~2^100 nodes can't be true - something went wrong
+                        raise Exception("Invalid tree")
+
+                    stack.append(cur)
+                    cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), left_expression, None)
+
+                cur = stack.pop()
+                cache.append(cur.GetNonSyntheticValue().Dereference())
+                idx += 1
+
+                cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), right_expression, None)
+        except RenderingTimeoutError:
+            log("Tree walk has been stopped after {} nodes: time budget exceeded", idx)
+            self.timed_out = True
+
+        if self.timed_out:
+            has_more = True
+        elif size is None:
             if _get_ptr_value(cur) != 0 and check_condition(cur) or stack and idx >= max_size:
                 has_more = True
         else:
-            if idx < size:
-                cache.extend([None] * (size - idx))
+            if idx < max_size:
+                cache.extend([None] * (max_size - idx))
 
         self.cache = cache
         self.has_more = has_more
@@ -961,7 +1232,7 @@ class BinaryTreeIndexedNodesProvider(NodesProvider):
 
 class BinaryTreeCustomNamesNodesProvider(NodesProvider):
     def __init__(self, size, head_pointer, left_expression, right_expression, node_condition, custom_value_name,
-                 wildcards):
+                 wildcards, children_limit):
         super(BinaryTreeCustomNamesNodesProvider, self).__init__()
 
         cache = []
@@ -970,7 +1241,7 @@ class BinaryTreeCustomNamesNodesProvider(NodesProvider):
         name2index = {}
 
         # iterate all list nodes and cache them
-        max_size = size if size is not None else g_max_num_children
+        max_size = _get_max_children_count(size, children_limit)
         idx = 0
         cur = head_pointer
         stack = []  # parents
@@ -980,30 +1251,36 @@ class BinaryTreeCustomNamesNodesProvider(NodesProvider):
                 return True
             return _check_condition(node.GetNonSyntheticValue().Dereference(), node_condition)
 
-        while (_get_ptr_value(cur) != 0 and check_condition(cur) or stack) and idx < max_size:
-            while _get_ptr_value(cur) != 0 and check_condition(cur):
-                if len(stack) > 100:  # ~2^100 nodes can't be true - something went wrong
-                    raise Exception("Invalid tree")
-
-                stack.append(cur)
-                cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), left_expression, None)
-
-            cur = stack.pop()
-            cur_val = cur.GetNonSyntheticValue().Dereference()
-            name = _evaluate_interpolated_string(custom_value_name, cur_val, wildcards)
-            names.append(name)
-            name2index[name] = idx
-            cache.append(cur_val)
-            idx += 1
-
-            cur = eval_expression(cur_val, right_expression, None)
-
-        if size is None:
+        try:
+            while (_get_ptr_value(cur) != 0 and check_condition(cur) or stack) and idx < max_size:
+                while _get_ptr_value(cur) != 0 and check_condition(cur):
+                    if len(stack) > 100:  # ~2^100 nodes can't be true - something went wrong
+                        raise Exception("Invalid tree")
+
+                    stack.append(cur)
+                    cur = eval_expression(cur.GetNonSyntheticValue().Dereference(), left_expression, None)
+
+                cur = stack.pop()
+                cur_val = cur.GetNonSyntheticValue().Dereference()
+                name = _evaluate_interpolated_string(custom_value_name, cur_val, wildcards)
+                names.append(name)
+                name2index[name] = idx
+                cache.append(cur_val)
+                idx += 1
+
+                cur = eval_expression(cur_val, right_expression, None)
+        except RenderingTimeoutError:
+            log("Tree walk has been stopped after {} nodes: time budget exceeded", idx)
+            self.timed_out = True
+
+        if self.timed_out:
+            has_more = True
+        elif size is None:
             if _get_ptr_value(cur) != 0 and check_condition(cur) or stack and idx >= max_size:
                 has_more = True
         else:
-            if idx < size:
-                cache.extend([None] * (size - idx))
+            if idx < max_size:
+                cache.extend([None] * (max_size - idx))
 
         self.cache = cache
         self.has_more = has_more
@@ -1018,7 +1295,7 @@ def _node_processor_tree_items_head_pointer(head_pointer_node, ctx_val, wildcard
 
 
 @optional_node_processor
-def _node_processor_tree_items(tree_node, ctx_val, wildcards):
+def _node_processor_tree_items(tree_node, ctx_val, wildcards, children_limit):
     assert isinstance(tree_node, TypeVizItemProviderTreeItems)
     if tree_node.condition:
         if not _process_node_condition(tree_node.condition, ctx_val, wildcards):
@@ -1048,20 +1325,26 @@ def _node_processor_tree_items(tree_node, ctx_val, wildcards):
     condition = value_node.condition
     value_condition = _resolve_wildcards(condition.condition, wildcards) if condition and condition.condition else None
 
-    if value_node.name is None:
-        nodes_provider = BinaryTreeIndexedNodesProvider(size, head_pointer_value,
-                                                        left_pointer_expression, right_pointer_expression,
-                                                        value_condition)
-    else:
-        nodes_provider = BinaryTreeCustomNamesNodesProvider(size, head_pointer_value,
+    cache_key = _get_children_cache_key(tree_node, ctx_val, wildcards, size, _get_ptr_value(head_pointer_value))
+    nodes_provider = _get_nodes_from_children_cache(cache_key, ctx_val)
+    if nodes_provider is None:
+        if value_node.name is None:
+            nodes_provider = BinaryTreeIndexedNodesProvider(size, head_pointer_value,
                                                             left_pointer_expression, right_pointer_expression,
-                                                            value_condition, value_node.name, wildcards)
+                                                            value_condition, children_limit)
+        else:
+            nodes_provider = BinaryTreeCustomNamesNodesProvider(size, head_pointer_value,
+                                                                left_pointer_expression, right_pointer_expression,
+                                                                value_condition, value_node.name, wildcards,
+                                                                children_limit)
+        if children_limit is None and not nodes_provider.timed_out:
+            _put_nodes_to_children_cache(cache_key, ctx_val, nodes_provider)
 
     return CustomItemsProvider(nodes_provider, value_expression, value_opts, wildcards)
 
 
-def _process_item_provider_tree_items(tree_node, val, wildcards):
-    return _node_processor_tree_items(tree_node, val, wildcards)
+def _process_item_provider_tree_items(tree_node, val, wildcards, children_limit):
+    return _node_processor_tree_items(tree_node, val, wildcards, children_limit)
 
 
 class CustomListItemsInstruction(object):
@@ -1074,7 +1357,7 @@ class CustomListItemsInstruction(object):
             return True
         return _check_condition(ctx_val, self.condition, context)
 
-    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue]):
+    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue], item_recipes: list):
         return None
 
 
@@ -1083,7 +1366,7 @@ class CustomListItemsExecInstruction(CustomListItemsInstruction):
         super(CustomListItemsExecInstruction, self).__init__(next_instruction, condition)
         self.code = code
 
-    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue]):
+    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue], item_recipes: list):
         if self.evaluate_condition(ctx_val, context):
             eval_expression(ctx_val, self.code, None, context)
         return self.next_instruction
@@ -1096,7 +1379,7 @@ class CustomListItemsItemInstruction(CustomListItemsInstruction):
         self.expr = expr
         self.opts = opts
 
-    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue]):
+    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue], item_recipes: list):
         if self.evaluate_condition(ctx_val, context):
             if self.name:
                 name = _evaluate_interpolated_string(self.name, ctx_val, context=context)
@@ -1110,6 +1393,8 @@ class CustomListItemsItemInstruction(CustomListItemsInstruction):
             else:
                 size = None
 
+            # everything required to recreate the item from memory
+            item_recipes.append((name, item.GetLoadAddress(), item.GetType(), self.opts, size))
             item = _apply_value_formatting(item, self.opts.format_spec, self.opts.format_flags, size,
                                            self.opts.view_spec_id)
             items_collector.append(item)
@@ -1122,7 +1407,7 @@ class CustomListItemsIfInstruction(CustomListItemsInstruction):
         super(CustomListItemsIfInstruction, self).__init__(next_instruction, condition)
         self.then_instruction = then_instruction
 
-    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue]):
+    def execute(self, ctx_val: lldb.SBValue, context, items_collector: List[lldb.SBValue], item_recipes: list):
         if self.evaluate_condition(ctx_val, context):
             return self.then_instruction
         return self.next_instruction
@@ -1201,19 +1486,55 @@ def _process_variables_nodes(variable_nodes: List[TypeVizItemVariableTypeNode],
 
     def create_context(ctx_var: lldb.SBValue, first_time: bool):
         options = lldb.SBExpressionOptions()
-        ctx_var.EvaluateExpression(first_time_code if first_time else code, options)
+        record_evaluated_value(ctx_var.EvaluateExpression(first_time_code if first_time else code, options))
         return EvaluationContext(prolog, epilog, None)
 
     return create_context
 
 
-class CustomListItemsProvider(AbstractChildrenProvider):
-    def __init__(self, instr: CustomListItemsInstruction, size, ctx_val, context):
-        self.cached_items = list()
-        max_size = size if size is not None else g_max_num_children
-        while instr and len(self.cached_items) < max_size:
-            instr = instr.execute(ctx_val, context, self.cached_items)
+def _execute_custom_list_items(instr: CustomListItemsInstruction, size, ctx_val, context, children_limit):
+    items = []
+    item_recipes = []
+    max_size = _get_max_children_count(size, children_limit)
+    timed_out = False
+    try:
+        while instr and len(items) < max_size:
+            instr = instr.execute(ctx_val, context, items, item_recipes)
+    except RenderingTimeoutError:
+        log("CustomListItems execution has been stopped after {} items: time budget exceeded", len(items))
+        timed_out = True
+    return items, item_recipes, timed_out
 
+
+def _get_custom_list_items_from_children_cache(key, ctx_val: lldb.SBValue) -> Optional[List[lldb.SBValue]]:
+    if key is None:
+        return None
+    item_recipes = g_children_cache.get(key, ctx_val.GetProcess())
+    if item_recipes is None:
+        return None
+
+    target = ctx_val.GetTarget()
+    items = []
+    for name, address, item_type, opts, size in item_recipes:
+        item = _create_value_from_address(target, name, address, item_type)
+        items.append(_apply_value_formatting(item, opts.format_spec, opts.format_flags, size, opts.view_spec_id))
+    return items
+
+
+def _put_custom_list_items_to_children_cache(key, ctx_val: lldb.SBValue, item_recipes):
+    if key is None:
+        return
+    regions = [(ctx_val.GetLoadAddress(), ctx_val.GetByteSize())]
+    for _, address, item_type, _, _ in item_recipes:
+        if address == lldb.LLDB_INVALID_ADDRESS:
+            return
+        regions.append((address, item_type.GetByteSize()))
+    g_children_cache.put(key, item_recipes, regions, ctx_val.GetProcess())
+
+
+class CustomListItemsProvider(AbstractChildrenProvider):
+    def __init__(self, items: List[lldb.SBValue]):
+        self.cached_items = items
         self.size = len(self.cached_items)
 
         self.name_to_item = dict()
@@ -1237,7 +1558,8 @@ g_node_to_evaluation_context_factory = {}
 
 
 @optional_node_processor
-def _node_processor_custom_list_items(tree_node: TypeVizItemProviderCustomListItems, ctx_val: lldb.SBValue, wildcards):
+def _node_processor_custom_list_items(tree_node: TypeVizItemProviderCustomListItems, ctx_val: lldb.SBValue, wildcards,
+                                      children_limit):
     root_instr = _process_code_block_nodes(tree_node.code_block_nodes, wildcards, None, [])
 
     if tree_node.condition:
@@ -1247,6 +1569,11 @@ def _node_processor_custom_list_items(tree_node: TypeVizItemProviderCustomListIt
     size = _find_first_good_node(_node_processor_size, tree_node.size_nodes, ctx_val, wildcards)
     # size can be None
 
+    cache_key = _get_children_cache_key(tree_node, ctx_val, wildcards, size)
+    items = _get_custom_list_items_from_children_cache(cache_key, ctx_val)
+    if items is not None:
+        return CustomListItemsProvider(items)
+
     instantiated_node = (tree_node, wildcards)
     if instantiated_node not in g_node_to_evaluation_context_factory:
         context_factory = _process_variables_nodes(tree_node.variables_nodes, wildcards)
@@ -1256,14 +1583,17 @@ def _node_processor_custom_list_items(tree_node: TypeVizItemProviderCustomListIt
         context_factory = g_node_to_evaluation_context_factory[instantiated_node]
         context = context_factory(ctx_val, False)
 
-    return CustomListItemsProvider(root_instr, size, ctx_val, context)
+    items, item_recipes, timed_out = _execute_custom_list_items(root_instr, size, ctx_val, context, children_limit)
+    if children_limit is None and not timed_out:
+        _put_custom_list_items_to_children_cache(cache_key, ctx_val, item_recipes)
+    return CustomListItemsProvider(items)
 
 
-def _process_item_provider_custom_list_items(tree_node, val, wildcards):
-    return _node_processor_custom_list_items(tree_node, val, wildcards)
+def _process_item_provider_custom_list_items(tree_node, val, wildcards, children_limit):
+    return _node_processor_custom_list_items(tree_node, val, wildcards, children_limit)
 
 
-def _build_child_providers(item_providers, value_non_synth, wildcards):
+def _build_child_providers(item_providers, value_non_synth, wildcards, children_limit=None):
     provider_handlers = {
         TypeVizItemProviderTypeKind.Single: _process_item_provider_single,
         TypeVizItemProviderTypeKind.Expanded: _process_item_provider_expanded,
@@ -1278,7 +1608,12 @@ def _build_child_providers(item_providers, value_non_synth, wildcards):
         handler = provider_handlers.get(item_provider.kind)
         if not handler:
             continue
-        child_provider = handler(item_provider, value_non_synth, wildcards)
+        try:
+            child_provider = handler(item_provider, value_non_synth, wildcards, children_limit)
+        except RenderingTimeoutError:
+            # keep children collected before the time budget was exceeded
+            log("Building of child providers has been stopped: time budget exceeded")
+            break
         if not child_provider:
             continue
         child_providers.append(child_provider)
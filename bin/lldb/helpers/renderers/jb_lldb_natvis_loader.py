@@ -1,7 +1,22 @@
-from jb_declarative_formatters.parsers.natvis import natvis_parse_file
+import glob
+import multiprocessing
+import os
+import sys
+import traceback
+import weakref
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from jb_declarative_formatters.parsers.natvis import natvis_parse_file_with_digests, \
+    natvis_parse_file_types_with_digests, natvis_init_parsing_worker
 from jb_declarative_formatters.type_viz_storage import TypeVizStorage
+from .jb_lldb_declarative_formatters_loaders import type_viz_bulk_loader_add, type_viz_incremental_loader_add, \
+    type_viz_path_expander_add
 from .jb_lldb_logging import log, get_logger
 
+# File path and (digest of the type node, parsed type) pairs in the order of the file, by storage
+g_parsed_types_by_storage = weakref.WeakKeyDictionary()
+
 
 def natvis_loader(filepath):
     storage = TypeVizStorage(get_logger())
@@ -9,11 +24,114 @@ def natvis_loader(filepath):
     return storage
 
 
+# Files are parsed by worker processes and registered in storages in the order of the files
+def natvis_bulk_loader(filepaths, process_count):
+    if process_count <= 1 or len(filepaths) <= 1:
+        return (natvis_loader(filepath) for filepath in filepaths)
+
+    # forking would copy the debugger with its threads, workers are started from scratch instead
+    executable = sys.executable
+    if not executable or not os.path.basename(executable).lower().startswith('python'):
+        log("No python executable for worker processes, fallback to sequential parsing: '{}'", executable)
+        return (natvis_loader(filepath) for filepath in filepaths)
+
+    log("Parsing {} files in {} processes", len(filepaths), process_count)
+    try:
+        with ProcessPoolExecutor(max_workers=min(process_count, len(filepaths)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=natvis_init_parsing_worker, initargs=(list(sys.path),)) as pool:
+            parse_results = list(pool.map(natvis_parse_file_types_with_digests, filepaths))
+    except Exception as e:
+        log("Parsing in worker processes failed, fallback to sequential parsing: {}\n{}", e, traceback.format_exc())
+        return (natvis_loader(filepath) for filepath in filepaths)
+
+    storages = []
+    for filepath, (parsed_types, messages) in zip(filepaths, parse_results):
+        for message in messages:
+            log("{}", message)
+        log("Parsed {}", filepath)
+        storage = TypeVizStorage(get_logger())
+        _add_parsed_types(storage, filepath, parsed_types)
+        storages.append(storage)
+    return storages
+
+
+# Only types which nodes were changed are parsed again, their buckets in the storage are rebuilt in the file order.
+# Returns the removed and added types, or None if the storage has to be loaded from scratch.
+def natvis_incremental_loader(filepath, storage):
+    old_filepath, old_parsed_types = g_parsed_types_by_storage.get(storage, (None, None))
+    if old_filepath != filepath:
+        return None
+
+    log("Updating {}", filepath)
+    parsed_types = list(natvis_parse_file_with_digests(filepath, get_logger(), _log_parsing_progress,
+                                                       dict(old_parsed_types)))
+    old_counts = Counter(digest for digest, _ in old_parsed_types)
+    new_counts = Counter(digest for digest, _ in parsed_types)
+    removed = [type_viz for digest, type_viz in old_parsed_types if old_counts[digest] != new_counts[digest]]
+    added = [type_viz for digest, type_viz in parsed_types if old_counts[digest] != new_counts[digest]]
+    changed = removed + added
+    if [digest for digest, _ in old_parsed_types if old_counts[digest] == new_counts[digest]] != \
+            [digest for digest, _ in parsed_types if old_counts[digest] == new_counts[digest]]:
+        # moved types change the order of visualizers in their buckets as well
+        changed += [type_viz for _, type_viz in parsed_types]
+
+    for type_viz in removed:
+        log("Unregister types: {}", ', '.join(map(_type_viz_name_pp, type_viz.type_viz_names)))
+    for type_viz in added:
+        log("Register types: {}", ', '.join(map(_type_viz_name_pp, type_viz.type_viz_names)))
+    storage.update_types(changed, (type_viz for _, type_viz in parsed_types))
+    g_parsed_types_by_storage[storage] = (filepath, parsed_types)
+    return removed + added
+
+
+NATVIS_FILE_PATTERN = '*.natvis'
+
+
+# Directories are searched recursively, files are sorted to get the same load order on every run
+def natvis_expand_path(path):
+    if os.path.isdir(path):
+        path = os.path.join(glob.escape(path), '**', NATVIS_FILE_PATTERN)
+    return sorted(filepath for filepath in glob.glob(path, recursive=True) if os.path.isfile(filepath))
+
+
+type_viz_bulk_loader_add(natvis_loader, natvis_bulk_loader)
+type_viz_incremental_loader_add(natvis_loader, natvis_incremental_loader)
+type_viz_path_expander_add(natvis_loader, natvis_expand_path)
+
+PROGRESS_LOG_STEP = 1000
+
+
 def load_natvis_file(storage, filepath):
     log("Parsing {}", filepath)
-    for type_viz in natvis_parse_file(filepath, get_logger()):
+    _add_parsed_types(storage, filepath, natvis_parse_file_with_digests(filepath, get_logger(), _log_parsing_progress))
+
+
+def _add_parsed_types(storage, filepath, parsed_types):
+    recorded_types = []
+    if storage in g_parsed_types_by_storage:
+        # types of several files can't be updated separately
+        g_parsed_types_by_storage[storage] = (None, None)
+    else:
+        g_parsed_types_by_storage[storage] = (filepath, recorded_types)
+    storage.add_types(_log_registered_types(_record_parsed_types(parsed_types, recorded_types)))
+
+
+def _record_parsed_types(parsed_types, recorded_types):
+    for digest, type_viz in parsed_types:
+        recorded_types.append((digest, type_viz))
+        yield type_viz
+
+
+def _log_registered_types(types):
+    for type_viz in types:
         log("Register types: {}", ', '.join(map(_type_viz_name_pp, type_viz.type_viz_names)))
-        storage.add_type(type_viz)
+        yield type_viz
+
+
+def _log_parsing_progress(types_count, bytes_read, bytes_total):
+    if types_count % PROGRESS_LOG_STEP == 0:
+        log("{} types parsed, {}% of the file read", types_count, bytes_read * 100 // max(bytes_total, 1))
 
 
 def _type_viz_name_pp(type_viz_name):
@@ -0,0 +1,40 @@
+from typing import Callable, Iterable
+
+from renderers.jb_lldb_logging import log
+from renderers.jb_lldb_utils import RenderingTimeoutError, set_deadline, get_deadline_for_time_budget, \
+    is_deadline_exceeded
+
+# Summaries and children are prefetched by the stop hook before the stop is reported, within a short time budget.
+# Prefetching runs on the thread of the stop hook, so it never runs concurrently with real requests and
+# never competes with them for LLDB locks. Renderings cut by the time budget of prefetching are not kept.
+# It can't be moved to a background thread: formatters are called with the API lock of the target held, so a
+# formatter waiting for an interrupted prefetch would deadlock with it, and without waiting both would share
+# the deadline and the caches. The time budget is kept small instead, it delays every stop.
+
+g_prefetching = False
+
+
+def is_prefetching() -> bool:
+    return g_prefetching
+
+
+def run_prefetch(tasks: Iterable[Callable[[], None]], time_budget: float):
+    global g_prefetching
+    prev_deadline = set_deadline(get_deadline_for_time_budget(time_budget))
+    g_prefetching = True
+    try:
+        for task in tasks:
+            if is_deadline_exceeded():
+                log("Prefetching has been stopped: time budget exceeded")
+                return
+            try:
+                task()
+            except RenderingTimeoutError:
+                log("Prefetching has been stopped: time budget exceeded")
+                return
+            except Exception as e:
+                log("Prefetching failed: {}", e)
+        log("Prefetching has been completed")
+    finally:
+        g_prefetching = False
+        set_deadline(prev_deadline)
@@ -1,8 +1,10 @@
-from typing import Optional
+import time
+from contextlib import contextmanager
+from typing import Optional, Sequence
 
 import lldb
-from renderers.jb_lldb_declarative_formatters_options import set_recursion_level
-from renderers.jb_lldb_format_specs import eFormatRawView
+from renderers.jb_lldb_declarative_formatters_options import set_recursion_level, get_max_string_length
+from renderers.jb_lldb_format_specs import eFormatRawView, eFormatAsArray
 from renderers.jb_lldb_logging import log
 from six import StringIO
 
@@ -12,43 +14,214 @@ class EvaluateError(Exception):
         super(Exception, self).__init__(str(error))
 
 
+class EvaluateParseError(EvaluateError):
+    pass
+
+
+# Raised when rendering takes longer than its time budget, renderers don't handle it as an evaluation error
+class RenderingTimeoutError(Exception):
+    pass
+
+
 class IgnoreSynthProvider(Exception):
     def __init__(self, msg=None):
         super(Exception, self).__init__(str(msg) if msg else None)
 
 
+# Monotonic time the current rendering must be completed by, None if it has no time budget
+g_deadline: Optional[float] = None
+
+
+def set_deadline(deadline: Optional[float]) -> Optional[float]:
+    global g_deadline
+    prev = g_deadline
+    g_deadline = deadline
+    return prev
+
+
+def get_deadline_for_time_budget(time_budget: float) -> float:
+    deadline = time.monotonic() + time_budget
+    return deadline if g_deadline is None else min(deadline, g_deadline)
+
+
+def is_deadline_exceeded() -> bool:
+    return g_deadline is not None and time.monotonic() > g_deadline
+
+
+def check_deadline():
+    if is_deadline_exceeded():
+        raise RenderingTimeoutError('Time budget of the rendering has been exceeded')
+
+
+# Length of the text output by the stream and all its nested streams
+class StreamBudget(object):
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.length = 0
+
+    def is_exhausted(self):
+        return self.length > self.limit
+
+
+# Summaries of objects in memory already rendered as a part of the output (fragments and their length)
+# and objects being rendered at the moment with their nesting depth, by (load address, type name, format, array size)
+class SummaryMemo(object):
+    def __init__(self):
+        self.rendered = {}
+        self.in_progress = {}
+        # the lowest depth of objects met again while being rendered
+        self.cycle_depth = INFINITE_DEPTH
+        # memory regions (address, size) the output depends on, collected only if not None
+        self.regions = None
+        # set if the output depends on values computed by expressions, they have no memory to check
+        self.untracked = False
+
+
+INFINITE_DEPTH = 2 ** 32
+
+# Memo of the summary rendered for the summary cache, values evaluated by expressions are recorded into it
+g_recording_memo: Optional[SummaryMemo] = None
+
+
+def set_recording_memo(memo: Optional[SummaryMemo]) -> Optional[SummaryMemo]:
+    global g_recording_memo
+    prev_memo = g_recording_memo
+    g_recording_memo = memo
+    return prev_memo
+
+
+def record_evaluated_value(value: Optional[lldb.SBValue]):
+    # only memory of the result is tracked, not the memory read on the way to it. None stands for a computed value
+    if g_recording_memo is None:
+        return
+    if value is None or value.GetError().Fail():
+        g_recording_memo.untracked = True
+        return
+    if value.GetType().IsReferenceType():
+        value = value.Dereference()
+    address = value.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        g_recording_memo.untracked = True
+    else:
+        g_recording_memo.regions.append((address, value.GetByteSize()))
+
+
+g_memo_type_classes = {lldb.eTypeClassStruct, lldb.eTypeClassClass, lldb.eTypeClassUnion}
+
+
 class Stream(object):
-    def __init__(self, is64bit: bool, initial_level: int):
-        self.stream = StringIO()
+    def __init__(self, is64bit: bool, initial_level: int, budget: Optional[StreamBudget] = None,
+                 memo: Optional[SummaryMemo] = None):
+        # text is collected as a list of fragments and joined once, nested streams are merged without copying
+        self.fragments = []
         self.pointer_format = "0x{:016x}" if is64bit else "0x{:08x}"
-        self.length = 0
+        self.budget = budget if budget is not None else StreamBudget(get_max_string_length())
+        self.nested_start_length = self.budget.length
+        self.memo = memo if memo is not None else SummaryMemo()
         self.level = initial_level
 
+    @property
+    def length(self):
+        return self.budget.length
+
     def create_nested(self):
-        val = self.__class__(False, self.level)
+        val = self.__class__(False, self.level, self.budget, self.memo)
         val.pointer_format = self.pointer_format
-        val.length = self.length
         return val
 
+    def output_nested(self, nested_stream: 'Stream'):
+        self.fragments.extend(nested_stream.fragments)
+
+    def discard_nested(self, nested_stream: 'Stream'):
+        # text of the discarded stream is not a part of the output anymore
+        self.budget.length = nested_stream.nested_start_length
+
     def output(self, text):
-        self.length += len(text)
-        self.stream.write(text)
+        self.budget.length += len(text)
+        self.fragments.append(text)
+
+    def record_memory_region(self, address: int, size: int):
+        if self.memo.regions is not None:
+            self.memo.regions.append((address, size))
 
     def output_object(self, val_non_synth: lldb.SBValue):
+        if self.budget.is_exhausted():
+            # the text would be truncated anyway, don't spend time on evaluation
+            self.output('...')
+            return
+        check_deadline()
+
         log("Retrieving summary of value named '{}'...", val_non_synth.GetName())
 
         val_type = val_non_synth.GetType()
         format_spec = val_non_synth.GetFormat()
         use_raw_viz = format_spec & eFormatRawView
         provider = get_viz_descriptor_provider()
-        vis_descriptor = provider.get_matched_visualizers(val_type, use_raw_viz)
-
+        vis_descriptor = provider.get_matched_visualizers(val_type, use_raw_viz, val_non_synth.GetTarget())
+
+        if self.memo.regions is not None:
+            address = val_non_synth.GetLoadAddress()
+            if address != lldb.LLDB_INVALID_ADDRESS:
+                self.memo.regions.append((address, val_type.GetByteSize()))
+
+        memo_key = self._get_memo_key(val_non_synth, val_type, format_spec)
+        if memo_key is None:
+            self._output_object_uncached(provider, vis_descriptor, val_non_synth, val_type)
+            return
+
+        memo = self.memo
+        cycle_depth = memo.in_progress.get(memo_key)
+        if cycle_depth is not None:
+            log("Value named '{}' refers to itself", val_non_synth.GetName())
+            memo.cycle_depth = min(memo.cycle_depth, cycle_depth)
+            self.output('{...}')
+            return
+
+        rendered = memo.rendered.get(memo_key)
+        if rendered is not None:
+            fragments, length = rendered
+            if self.budget.length + length <= self.budget.limit:
+                self.fragments.extend(fragments)
+                self.budget.length += length
+                return
+
+        start_index = len(self.fragments)
+        start_length = self.budget.length
+        depth = len(memo.in_progress)
+        outer_cycle_depth = memo.cycle_depth
+        memo.cycle_depth = INFINITE_DEPTH
+        memo.in_progress[memo_key] = depth
+        try:
+            self._output_object_uncached(provider, vis_descriptor, val_non_synth, val_type)
+        finally:
+            del memo.in_progress[memo_key]
+            inner_cycle_depth = memo.cycle_depth
+            memo.cycle_depth = min(outer_cycle_depth, inner_cycle_depth)
+
+        # text is reusable only if it doesn't depend on the place where the object is met:
+        # it isn't truncated and doesn't refer to objects rendered outside of it
+        if not self.budget.is_exhausted() and inner_cycle_depth >= depth:
+            memo.rendered[memo_key] = (self.fragments[start_index:], self.budget.length - start_length)
+
+    @staticmethod
+    def _get_memo_key(val_non_synth: lldb.SBValue, val_type: lldb.SBType, format_spec: int):
+        if val_type.GetCanonicalType().GetTypeClass() not in g_memo_type_classes:
+            return None
+        address = val_non_synth.GetLoadAddress()
+        if address == lldb.LLDB_INVALID_ADDRESS:
+            return None
+        array_size = val_non_synth.GetFormatAsArraySize() if format_spec & eFormatAsArray else None
+        return address, val_type.GetName(), format_spec, array_size
+
+    def _output_object_uncached(self, provider, vis_descriptor, val_non_synth: lldb.SBValue, val_type: lldb.SBType):
         self.level += 1
         prev_level = set_recursion_level(self.level)
         try:
             if vis_descriptor is not None:
                 try:
                     vis_descriptor.output_summary(val_non_synth, self)
+                except RenderingTimeoutError:
+                    raise
                 except Exception as e:
                     log('Internal error: {}', str(e))
 
@@ -60,10 +233,12 @@ class Stream(object):
 
     def _output_object_fallback(self, provider, val_non_synth, val_type):
         # force use raw vis descriptor
-        vis_descriptor = provider.get_matched_visualizers(val_type, True)
+        vis_descriptor = provider.get_matched_visualizers(val_type, True, val_non_synth.GetTarget())
         if vis_descriptor is not None:
             try:
                 vis_descriptor.output_summary(val_non_synth, self)
+            except RenderingTimeoutError:
+                raise
             except Exception as e:
                 log('Internal error: {}', str(e))
         else:
@@ -89,7 +264,7 @@ class Stream(object):
         self.output_comment(self.pointer_format.format(address))
 
     def __str__(self):
-        return self.stream.getvalue()
+        return ''.join(self.fragments)
 
 
 INVALID_CHILD_INDEX = 2 ** 32 - 1
@@ -105,6 +280,10 @@ class AbstractChildrenProvider(object):
     def get_child_at_index(self, index):
         return None
 
+    def get_children_range(self, start, count):
+        end = min(start + count, self.num_children())
+        return [self.get_child_at_index(index) for index in range(max(start, 0), end)]
+
 
 g_empty_children_provider = AbstractChildrenProvider()
 
@@ -118,7 +297,11 @@ class AbstractVisDescriptor(object):
 
 
 class AbstractVizDescriptorProvider(object):
-    def get_matched_visualizers(self, value_type: lldb.SBType, raw_visualizer: bool) -> AbstractVisDescriptor:
+    def get_matched_visualizers(self, value_type: lldb.SBType, raw_visualizer: bool,
+                                target: lldb.SBTarget) -> AbstractVisDescriptor:
+        pass
+
+    def clear_cache(self):
         pass
 
 
@@ -136,29 +319,29 @@ def set_viz_descriptor_provider(provider: AbstractVizDescriptorProvider):
 
 class FormattedStream(Stream):
     def output_string(self, text):
-        self.stream.write("\xfeS")
+        self.fragments.append("\xfeS")
         self.output(text)
-        self.stream.write("\xfeE")
+        self.fragments.append("\xfeE")
 
     def output_keyword(self, text):
-        self.stream.write("\xfeK")
+        self.fragments.append("\xfeK")
         self.output(text)
-        self.stream.write("\xfeE")
+        self.fragments.append("\xfeE")
 
     def output_number(self, text):
-        self.stream.write("\xfeN")
+        self.fragments.append("\xfeN")
         self.output(text)
-        self.stream.write("\xfeE")
+        self.fragments.append("\xfeE")
 
     def output_comment(self, text):
-        self.stream.write("\xfeC")
+        self.fragments.append("\xfeC")
         self.output(text)
-        self.stream.write("\xfeE")
+        self.fragments.append("\xfeE")
 
     def output_value(self, text):
-        self.stream.write("\xfeV")
+        self.fragments.append("\xfeV")
         self.output(text)
-        self.stream.write("\xfeE")
+        self.fragments.append("\xfeE")
 
 
 def make_absolute_name(root, name):
@@ -177,6 +360,100 @@ class EvaluationContext(object):
         self.context_variables: Optional[lldb.SBValueList] = context_variables
 
 
+# Expressions that can't be compiled in context of the type, they fail the same way for every value of this type
+g_expression_parse_errors = {}
+
+
+def clear_expression_parse_errors_cache():
+    g_expression_parse_errors.clear()
+    g_failed_expression_batches.clear()
+
+
+# Independent expressions evaluated in context of the same value are compiled as a single expression
+# which returns a structure with results of all of them. Results are served to eval_expression while
+# the batch is active, by (type name, load address, expression). Results are (value, computed), computed
+# values are copies in the structure rather than references to memory of the process
+g_batched_results = {}
+# Batches that failed to compile or to run in context of the type, (type name, expressions)
+g_failed_expression_batches = set()
+
+
+@contextmanager
+def batched_expressions(val: lldb.SBValue, expressions: Sequence[str]):
+    keys = _evaluate_expressions_batch(val, expressions)
+    try:
+        yield
+    finally:
+        for key in keys:
+            g_batched_results.pop(key, None)
+
+
+def _evaluate_expressions_batch(val: lldb.SBValue, expressions: Sequence[str]):
+    address = val.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return []
+
+    type_name = val.GetTypeName()
+    # lambdas can't appear in decltype, expressions known to fail are reported by the sequential evaluation
+    codes = []
+    for code in expressions:
+        if code not in codes and "__findnonnull" not in code and (type_name, code) not in g_expression_parse_errors:
+            codes.append(code)
+    if len(codes) < 2:
+        return []
+
+    batch_key = (type_name, tuple(codes))
+    if batch_key in g_failed_expression_batches:
+        return []
+
+    # types are deduced outside of the structure, local classes have no access to `this` of the value
+    type_aliases = ''.join('using __jb_batch_t{} = decltype(({}));'.format(i, code) for i, code in enumerate(codes))
+    members = ''.join('__jb_batch_t{0} m{0};'.format(i) for i in range(len(codes)))
+    initializers = ', '.join('({})'.format(code) for code in codes)
+    batch_code = '{}struct __jb_batch_t {{ {} }}; __jb_batch_t{{ {} }};'.format(type_aliases, members, initializers)
+
+    log("Evaluate batch of {} expressions in context of '{}' of type '{}'", len(codes), val.GetName(), type_name)
+    # the batch must be as cheap as the expressions it replaces, so it never runs code in the process.
+    # A batch the IR interpreter can't handle fails to parse and falls back to the sequential evaluation.
+    options = _create_expression_options()
+    options.SetAllowJIT(False)
+    options.SetTryAllThreads(False)
+    result = val.EvaluateExpression(batch_code, options)
+    if result is None:
+        return []
+    result_non_synth = result.GetNonSyntheticValue()
+    err: lldb.SBError = result_non_synth.GetError()
+    if err.Fail():
+        # a batch failing at runtime would fail the same way for other values of the type, e.g. on a null pointer
+        # in one of the expressions, and every failed attempt costs as much as the batch itself
+        log("Evaluate batch failed, fallback to evaluation one by one: {}", str(err))
+        g_failed_expression_batches.add(batch_key)
+        return []
+
+    keys = []
+    for index, code in enumerate(codes):
+        member: lldb.SBValue = result_non_synth.GetChildAtIndex(index)
+        computed = not member.GetType().IsReferenceType()
+        if not computed:
+            member = member.Dereference()
+        key = (type_name, address, code)
+        g_batched_results[key] = (member, computed)
+        keys.append(key)
+    return keys
+
+
+def _create_expression_options() -> lldb.SBExpressionOptions:
+    options = lldb.SBExpressionOptions()
+    options.SetSuppressPersistentResult(True)
+    options.SetFetchDynamicValue(lldb.eDynamicDontRunTarget)
+    if g_deadline is not None:
+        remaining = g_deadline - time.monotonic()
+        if remaining <= 0:
+            raise RenderingTimeoutError('Time budget of the rendering has been exceeded')
+        options.SetTimeoutInMicroSeconds(int(remaining * 1000000))
+    return options
+
+
 def eval_expression(val: lldb.SBValue, expr: str, value_name: Optional[str],
                     context: Optional[EvaluationContext] = None) -> lldb.SBValue:
     log("Evaluate '{}' in context of '{}' of type '{}'", expr, val.GetName(), val.GetTypeName())
@@ -200,11 +477,22 @@ def eval_expression(val: lldb.SBValue, expr: str, value_name: Optional[str],
     else:
         code = expr
 
+    parse_error_key = (val.GetTypeName(), code)
+    parse_error = g_expression_parse_errors.get(parse_error_key)
+    if parse_error is not None:
+        log("Evaluate failed (can't parse expression, cached): {}", parse_error)
+        raise EvaluateParseError(parse_error)
+
+    if g_batched_results and value_name is None:
+        batched_result, computed = g_batched_results.get((val.GetTypeName(), val.GetLoadAddress(), code), (None, None))
+        if batched_result is not None:
+            log("Evaluate succeed (batched): result type - {}", str(batched_result.GetTypeName()))
+            record_evaluated_value(None if computed else batched_result)
+            return batched_result
+
     err = lldb.SBError()
-    options = lldb.SBExpressionOptions()
-    options.SetSuppressPersistentResult(True)
-    options.SetFetchDynamicValue(lldb.eDynamicDontRunTarget)
-    result = val.EvaluateExpression(code, options, value_name)
+    result = val.EvaluateExpression(code, _create_expression_options(), value_name)
+    record_evaluated_value(result)
     if result is None:
         err.SetErrorString("evaluation setup failed")
         log("Evaluate failed: {}", str(err))
@@ -217,7 +505,8 @@ def eval_expression(val: lldb.SBValue, expr: str, value_name: Optional[str],
         err_code = err.GetError()
         if err_type == lldb.eErrorTypeExpression and err_code == lldb.eExpressionParseError:
             log("Evaluate failed (can't parse expression): {}", str(err))
-            raise EvaluateError(err)
+            g_expression_parse_errors[parse_error_key] = str(err)
+            raise EvaluateParseError(err)
 
         # error is runtime error which is handled later
         log("Returning value with error: {}", str(err))
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from jb_declarative_formatters.parsers.type_name_parser import parse_type_name_template
+from renderers.jb_lldb_natvis_loader import natvis_loader, natvis_incremental_loader
+
+# Updating a storage by the incremental natvis loader must give the same lookups as loading the file from scratch.
+# Run by the Python of LLDB from bin/lldb/helpers with bin/helpers added to the path:
+#   PYTHONPATH=$(lldb -P):../../helpers python3 -m unittest tests.test_jb_lldb_natvis_loader
+
+NATVIS_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n' \
+                '<AutoVisualizer xmlns="http://schemas.microsoft.com/vstudio/debugger/natvis/2010">\n'
+NATVIS_FOOTER = '</AutoVisualizer>\n'
+
+# duplicate exact names, duplicate and equally specific wildcards, a type with several names
+TYPES = [
+    ('Foo', 'first'),
+    ('Foo', 'second'),
+    ('Bar&lt;*&gt;', 'bar any'),
+    ('Bar&lt;int,*&gt;', 'bar int first'),
+    ('Bar&lt;*,int&gt;', 'bar int second'),
+    ('Bar&lt;*&gt;', 'bar any again'),
+    ('Baz', 'baz'),
+]
+LOOKED_UP_NAMES = ['Foo', 'Bar<int>', 'Bar<int,int>', 'Bar<char,int>', 'Bar<int,char>', 'Baz', 'Qux']
+
+EDITS = [
+    ('edit the first duplicate', lambda types: [(types[0][0], 'first edited')] + types[1:]),
+    ('edit the last duplicate', lambda types: types[:1] + [(types[1][0], 'second edited')] + types[2:]),
+    ('edit a wildcard tie', lambda types: types[:3] + [(types[3][0], 'bar int first edited')] + types[4:]),
+    ('swap wildcard ties', lambda types: types[:3] + [types[4], types[3]] + types[5:]),
+    ('remove a duplicate', lambda types: types[1:]),
+    ('add a duplicate in front', lambda types: [('Baz', 'baz in front')] + types),
+    ('rename a type', lambda types: types[:-1] + [('Qux', 'baz')]),
+]
+
+
+def write_natvis(filepath, types):
+    with open(filepath, 'w') as f:
+        f.write(NATVIS_HEADER)
+        for name, display_string in types:
+            f.write('  <Type Name="{}"><DisplayString>{}</DisplayString></Type>\n'.format(name, display_string))
+        f.write(NATVIS_FOOTER)
+
+
+def dump_lookups(storage):
+    lookups = []
+    for name in LOOKED_UP_NAMES:
+        type_vizs = storage.get_matched_types(parse_type_name_template(name))
+        lookups.append((name, [(str(type_viz_name), _get_display_string(type_viz))
+                               for type_viz, type_viz_name in type_vizs]))
+    registered = [(regex, _get_display_string(type_viz)) for regex, type_viz, _ in
+                  list(storage.iterate_exactly_matched_type_viz()) + list(storage.iterate_wildcard_matched_type_viz())]
+    return lookups, registered
+
+
+def _get_display_string(type_viz):
+    return ''.join(text for text, _ in type_viz.summaries[0].value.parts_list)
+
+
+class NatvisIncrementalLoaderTest(unittest.TestCase):
+    def test_incremental_update_matches_fresh_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, 'test.natvis')
+            for title, edit in EDITS:
+                with self.subTest(title):
+                    write_natvis(filepath, TYPES)
+                    storage = natvis_loader(filepath)
+                    write_natvis(filepath, edit(TYPES))
+                    self.assertIsNotNone(natvis_incremental_loader(filepath, storage),
+                                         'the storage was not updated incrementally')
+                    self.assertEqual(dump_lookups(natvis_loader(filepath)), dump_lookups(storage))
+
+
+if __name__ == '__main__':
+    unittest.main()